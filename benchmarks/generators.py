@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Reproducible synthetic input files for the benchmarks.
+
+The files only mimic the shape of the real dictionaries (the markup the
+converters look at and a realistic mix of optional parts); the text
+itself is random. The same ``count`` and ``seed`` always give the same
+file.
+"""
+
+import codecs
+import random
+
+KANA = u'あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわん'
+KATAKANA = u'アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモラリルレロ'
+KANJI = u'日本語学生先山川木火水金土月人大小中上下手足目口耳心体愛相合光栄清重理究'
+WIDE_DIGITS = u'０１２３４５６７８９'
+TRAD_NUMBERS = u'一二三四五'
+BILLARD_BALLS = u'❶❷❸❹❺'
+
+# JMdict entities as they appear in the DTD
+JMDICT_ENTITIES = [
+    ('n', 'noun (common) (futsuumeishi)'),
+    ('vs', 'noun or participle which takes the aux. verb suru'),
+    ('adj-i', 'adjective (keiyoushi)'),
+    ('adj-na', 'adjectival nouns or quasi-adjectives (keiyodoshi)'),
+    ('exp', 'expressions (phrases, clauses, etc.)'),
+    ('uk', 'word usually written using kana alone'),
+    ('arch', 'archaism'),
+    ('comp', 'computer terminology'),
+    ('med', 'medicine, etc. term'),
+    ('ksb', 'Kansai-ben'),
+    ('kyb', 'Kyoto-ben'),
+]
+POS_ENTITIES = ['n', 'vs', 'adj-i', 'adj-na', 'exp']
+MISC_ENTITIES = ['uk', 'arch']
+FIELD_ENTITIES = ['comp', 'med']
+DIAL_ENTITIES = ['ksb', 'kyb']
+
+DAIJIRIN2_POS = [u'（名）', u'（名）スル', u'（名・形動）[文]ナリ', u'（副）', u'（感）', u'（連語）']
+
+def word(rng, chars, low, high):
+    return u''.join(rng.choice(chars) for i in range(rng.randint(low, high)))
+
+def headwords(count, seed=0):
+    """Return ``count`` ``(kanji, reading)`` pairs; a third have no kanji."""
+    rng = random.Random(seed)
+    words = list()
+    for i in range(count):
+        reading = word(rng, KANA, 2, 5)
+        kanji = word(rng, KANJI, 1, 3) if i % 3 else None
+        words.append((kanji, reading))
+    return words
+
+def generate_jmdict(path, count, seed=0):
+    """Write a JMdict_e-like file with ``count`` entries."""
+    rng = random.Random(seed)
+    with codecs.open(path, 'w', 'utf-8') as f:
+        f.write(u'<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(u'<!DOCTYPE JMdict [\n<!ELEMENT JMdict (entry*)>\n')
+        for name, description in JMDICT_ENTITIES:
+            f.write(u'<!ENTITY {} "{}">\n'.format(name, description))
+        f.write(u']>\n<!-- JMdict created: 2014-07-01 -->\n<JMdict>\n')
+        for i, (kanji, reading) in enumerate(headwords(count, seed)):
+            f.write(u'<entry>\n<ent_seq>{}</ent_seq>\n'.format(1000000 + i))
+            if kanji is not None:
+                f.write(u'<k_ele>\n<keb>{}</keb>\n<ke_pri>news1</ke_pri>\n</k_ele>\n'.format(kanji))
+            f.write(u'<r_ele>\n<reb>{}</reb>\n</r_ele>\n'.format(reading))
+            if rng.random() < 0.05:
+                f.write(u'<r_ele>\n<reb>{}</reb>\n<re_nokanji/>\n</r_ele>\n'.format(word(rng, KATAKANA, 2, 5)))
+            for sense in range(rng.choice([1, 1, 1, 2, 2, 3, 4])):
+                f.write(u'<sense>\n')
+                if rng.random() < 0.05:
+                    f.write(u'<stagr>{}</stagr>\n'.format(reading))
+                f.write(u'<pos>&{};</pos>\n'.format(rng.choice(POS_ENTITIES)))
+                if rng.random() < 0.1:
+                    f.write(u'<xref>{}</xref>\n'.format(word(rng, KANA, 2, 4)))
+                if rng.random() < 0.03:
+                    f.write(u'<ant>{}</ant>\n'.format(word(rng, KANA, 2, 4)))
+                if rng.random() < 0.05:
+                    f.write(u'<field>&{};</field>\n'.format(rng.choice(FIELD_ENTITIES)))
+                if rng.random() < 0.15:
+                    f.write(u'<misc>&{};</misc>\n'.format(rng.choice(MISC_ENTITIES)))
+                if rng.random() < 0.03:
+                    f.write(u'<s_inf>usu. in the negative</s_inf>\n')
+                if rng.random() < 0.04:
+                    f.write(u'<lsource xml:lang="ger">Arbeit</lsource>\n')
+                if rng.random() < 0.01:
+                    f.write(u'<lsource ls_wasei="y"/>\n')
+                if rng.random() < 0.02:
+                    f.write(u'<dial>&{};</dial>\n'.format(rng.choice(DIAL_ENTITIES)))
+                for gloss in range(rng.randint(1, 4)):
+                    f.write(u'<gloss>meaning {} of entry {}</gloss>\n'.format(gloss + 1, i))
+                f.write(u'</sense>\n')
+            f.write(u'</entry>\n')
+        f.write(u'</JMdict>\n')
+
+def generate_examples(path, count, headword_count, seed=0):
+    """Write a Tanaka Corpus examples file (EUC-JP) with ``count`` sentences.
+
+    The components refer to the headwords of a JMdict file generated with
+    the same ``headword_count`` and ``seed``, so most of them match.
+    """
+    rng = random.Random(seed)
+    words = headwords(headword_count, seed)
+    with codecs.open(path, 'w', 'euc-jp') as f:
+        for i in range(count):
+            sentence = [rng.choice(words) for j in range(rng.randint(3, 8))]
+            expression = u'は'.join(kanji or reading for kanji, reading in sentence) + u'。'
+            f.write(u'A: {}\tExample sentence number {}.#ID={}_{}\n'.format(
+                expression, i, 2 * i, 2 * i + 1))
+            components = list()
+            for kanji, reading in sentence:
+                component = kanji or reading
+                if kanji is not None and rng.random() < 0.5:
+                    component += u'({})'.format(reading)
+                if rng.random() < 0.2:
+                    component += u'[{:02d}]'.format(rng.randint(1, 3))
+                if rng.random() < 0.1:
+                    component += u'{{{}}}'.format(component)
+                if rng.random() < 0.3:
+                    component += u'~'
+                components.append(component)
+            f.write(u'B: {}\n'.format(u' '.join(components)))
+
+def daijirin2_header(rng, reading, kanji):
+    parts = [u'<INDENT=1><PAGE><HEAD>{}</HEAD>'.format(reading)]
+    if rng.random() < 0.7:
+        parts.append(u'[{}]'.format(rng.randint(0, 4)))
+    if kanji is not None:
+        parts.append(u'【{}】'.format(kanji))
+    if rng.random() < 0.6:
+        parts.append(rng.choice(DAIJIRIN2_POS))
+    return u' '.join(parts) + u'\n'
+
+def daijirin2_definition(rng):
+    text = u'{}の{}。'.format(word(rng, KANJI + KANA, 4, 12), word(rng, KANJI, 2, 4))
+    for i in range(rng.choice([0, 0, 1, 2])):
+        text += u'「―{}」'.format(word(rng, KANA, 2, 6))
+    if rng.random() < 0.1:
+        text += u'「{}/万葉 {}」'.format(word(rng, KANA, 4, 8), rng.randint(1, 4000))
+    return text
+
+def daijirin2_numbered(rng, count):
+    lines = list()
+    for num in range(1, count + 1):
+        line = u'（{}）'.format(u''.join(WIDE_DIGITS[int(d)] for d in str(num)))
+        if rng.random() < 0.15:
+            line += u''.join(u'（{}）{}'.format(sub, daijirin2_definition(rng))
+                             for sub in u'アイウ'[:rng.randint(2, 3)])
+        else:
+            line += daijirin2_definition(rng)
+        lines.append(line)
+    return lines
+
+def generate_daijirin2(path, count, seed=0):
+    """Write a Daijirin2 dump with ``count`` entries in the
+    ``<INDENT=1><PAGE><HEAD>`` format."""
+    rng = random.Random(seed)
+    with codecs.open(path, 'w', 'utf-8') as f:
+        f.write(u'FORMAT: x\nTITLE: Super Daijirin\nVERSION: 2.0\n')
+        for i in range(count):
+            kanji = word(rng, KANJI, 1, 3) if rng.random() < 0.7 else None
+            reading = word(rng, KANA, 1, 3)
+            if rng.random() < 0.4:
+                reading += u'-' + word(rng, KANA, 1, 3)
+            f.write(daijirin2_header(rng, reading, kanji))
+            kind = rng.random()
+            if kind < 0.45:
+                lines = [daijirin2_definition(rng)]
+            elif kind < 0.8:
+                lines = daijirin2_numbered(rng, rng.randint(2, 5))
+            elif kind < 0.9:
+                lines = list()
+                for num in range(rng.randint(2, 3)):
+                    lines.append(BILLARD_BALLS[num] + daijirin2_definition(rng))
+                    if rng.random() < 0.5:
+                        lines.extend(daijirin2_numbered(rng, rng.randint(2, 3)))
+            else:
+                lines = [u'〔「{}」の転〕'.format(word(rng, KANA, 2, 4))]
+                for num in range(rng.randint(2, 3)):
+                    lines.append(u'■{}■ {}'.format(TRAD_NUMBERS[num], rng.choice(DAIJIRIN2_POS)))
+                    lines.extend(daijirin2_numbered(rng, rng.randint(1, 3)))
+            if rng.random() < 0.1:
+                lines.append(u'<LINK>→{}</LINK[{}:{}]>'.format(
+                    word(rng, KANJI, 1, 3), rng.randint(137000, 160000), rng.randint(0, 2000)))
+            if rng.random() < 0.03:
+                lines.append(u'<FIG>{}</FIG>[図]'.format(word(rng, KANJI, 2, 4)))
+            f.write(u'<INDENT=4>' + u'\n'.join(lines) + u'\n')
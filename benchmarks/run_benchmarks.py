@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Time the JMdict and Daijirin2 converters on synthetic input.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks [--compare OLD.json]
+
+Each converter runs in a fresh process so that its peak memory is its
+own. The time spent per entry is split into four stages:
+
+load       JMdict: loading the examples file. Daijirin2: reading the dump
+           and splitting it into entry blocks.
+parse      JMdict: iterparse of the next <entry>. Daijirin2: the grammar.
+transform  Building the output <entry> element.
+serialize  Writing the entry to the output file in the --format (default: xml).
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from lxml import etree
+from pyparsing import ParseException
+from benchmarks import generators
+from noj_converters.misc import sinks
+from noj_converters.misc.streaming import release
+from noj_converters.jmdict import jmdict_converter
+from noj_converters.daijirin2 import daijirin2_converter
+from noj_converters.daijirin2 import daijirin2_grammar as g
+
+STAGES = ('load', 'parse', 'transform', 'serialize')
+
+# Where the results go unless --output says otherwise; ignored by git
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+def peak_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        rss //= 1024 # bytes on OS X
+    return rss
+
+def stage_report(entries, seconds, rss_after_load):
+    total = sum(seconds.values())
+    stages = dict()
+    for stage in STAGES:
+        stages[stage] = {'seconds': seconds[stage],
+                         'entries_per_sec': entries / seconds[stage] if seconds[stage] else None}
+    return {'entries': entries,
+            'seconds': total,
+            'entries_per_sec': entries / total if total else None,
+            'stages': stages,
+            'rss_after_load_kb': rss_after_load,
+            'peak_rss_kb': peak_rss_kb()}
+
+def bench_jmdict(jmdict_path, examples_path, out_path, output_format='xml'):
+    seconds = dict.fromkeys(STAGES, 0.0)
+    start = time.time()
+    example_dict = jmdict_converter.load_examples(examples_path)
+    seconds['load'] = time.time() - start
+    rss_after_load = peak_rss_kb()
+
+    entries = 0
+    with open(jmdict_path, 'rb') as f:
+        with sinks.open_sink(output_format, out_path, 'dictionary') as sink:
+            context = iter(etree.iterparse(f, tag=('entry'), resolve_entities=False))
+            while True:
+                t0 = time.time()
+                try:
+                    action, elem = next(context)
+                except StopIteration:
+                    break
+                t1 = time.time()
+                xml_entry = jmdict_converter.convert_entry(elem, example_dict)
+                t2 = time.time()
+                sink.write(xml_entry)
+                release(elem)
+                t3 = time.time()
+                seconds['parse'] += t1 - t0
+                seconds['transform'] += t2 - t1
+                seconds['serialize'] += t3 - t2
+                entries += 1
+    report = stage_report(entries, seconds, rss_after_load)
+    report['format'] = output_format
+    return report
+
+def bench_daijirin2(dump_path, out_path, packrat=None, output_format='xml'):
+    if packrat:
+        g.enable_packrat(packrat)
+    converter = daijirin2_converter.Daijrin2Converter(dump_path, out_path, os.devnull)
+    seconds = dict.fromkeys(STAGES, 0.0)
+    entries = 0
+    errors = 0
+    with open(dump_path, 'rb') as f:
+        with sinks.open_sink(output_format, out_path, 'dictionary') as sink:
+            blocks = converter.entry_blocks(f)
+            meta_block, pos = next(blocks)
+            sink.write_meta(converter.meta_to_xml(meta_block.splitlines(True)[:-1]))
+            while True:
+                t0 = time.time()
+                try:
+                    entry_lines, pos = next(blocks)
+                except StopIteration:
+                    break
+                t1 = time.time()
+                try:
+                    header, body = g.parse_entry_record(entry_lines)
+                except ParseException:
+                    seconds['load'] += t1 - t0
+                    seconds['parse'] += time.time() - t1
+                    errors += 1
+                    continue
+                t2 = time.time()
+                xml_entry = converter.entry_to_xml(header, body)
+                t3 = time.time()
+                sink.write(xml_entry)
+                t4 = time.time()
+                seconds['load'] += t1 - t0
+                seconds['parse'] += t2 - t1
+                seconds['transform'] += t3 - t2
+                seconds['serialize'] += t4 - t3
+                entries += 1
+    rss_after_load = None # the dump is streamed, there is no separate load
+    report = stage_report(entries + errors, seconds, rss_after_load)
+    report['errors'] = errors
+    report['packrat'] = packrat
+    report['format'] = output_format
+    return report
+
+def run_isolated(func, *args):
+    """Run ``func(*args)`` in a new process and return its result."""
+    pool = multiprocessing.Pool(1)
+    try:
+        return pool.apply(func, args)
+    finally:
+        pool.close()
+        pool.join()
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=open(os.devnull, 'wb')).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def generate_data(data_dir, args):
+    paths = {'jmdict': os.path.join(data_dir, 'JMdict_e'),
+             'examples': os.path.join(data_dir, 'examples'),
+             'daijirin2': os.path.join(data_dir, 'daijirin2_dump.txt')}
+    if 'jmdict' in args.only:
+        generators.generate_jmdict(paths['jmdict'], args.jmdict_entries, args.seed)
+        generators.generate_examples(paths['examples'], args.examples,
+                                     args.jmdict_entries, args.seed)
+    if 'daijirin2' in args.only:
+        generators.generate_daijirin2(paths['daijirin2'], args.daijirin2_entries, args.seed)
+    return paths
+
+def print_report(name, report):
+    print "{}: {} entries in {:.2f}s, {:.1f} entries/s, peak RSS {} KB".format(
+        name, report['entries'], report['seconds'], report['entries_per_sec'] or 0,
+        report['peak_rss_kb'])
+    for stage in STAGES:
+        s = report['stages'][stage]
+        print "    {:<10} {:8.3f}s {:>12}".format(
+            stage, s['seconds'],
+            '{:.1f}/s'.format(s['entries_per_sec']) if s['entries_per_sec'] else '-')
+
+def print_comparison(old, new):
+    """Print new/old throughput ratios for each benchmark and stage."""
+    print "Compared to {} (ratio > 1 is faster):".format(old.get('commit'))
+    for name, report in sorted(new['benchmarks'].items()):
+        old_report = old['benchmarks'].get(name)
+        if old_report is None:
+            continue
+        rows = [('total', report, old_report)]
+        rows.extend((stage, report['stages'][stage], old_report['stages'][stage])
+                    for stage in STAGES)
+        for label, n, o in rows:
+            if n['entries_per_sec'] and o['entries_per_sec']:
+                print "    {:<10} {:<10} {:6.2f}x".format(
+                    name, label, n['entries_per_sec'] / o['entries_per_sec'])
+        print "    {:<10} {:<10} {:6.2f}x".format(
+            name, 'peak RSS', float(report['peak_rss_kb']) / old_report['peak_rss_kb'])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the converters on synthetic input.")
+    parser.add_argument('--only', nargs='+', choices=('jmdict', 'daijirin2'),
+                        default=['jmdict', 'daijirin2'])
+    parser.add_argument('--jmdict-entries', type=int, default=20000)
+    parser.add_argument('--examples', type=int, default=20000,
+                        help="number of example sentences (default: 20000)")
+    parser.add_argument('--daijirin2-entries', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--packrat', type=int, nargs='?', const=g.PACKRAT_CACHE_SIZE,
+                        metavar='CACHE_SIZE',
+                        help="also run Daijirin2 with packrat parsing enabled")
+    parser.add_argument('--format', choices=sinks.FORMATS, default='xml',
+                        help="output format to serialize to (default: xml)")
+    parser.add_argument('--data-dir',
+                        help="keep the generated input files here (default: a temporary directory)")
+    parser.add_argument('--output', '-o',
+                        help="JSON results file "
+                             "(default: benchmarks/results/benchmark-COMMIT.json)")
+    parser.add_argument('--compare', metavar='OLD_JSON',
+                        help="print throughput ratios against an earlier results file")
+    args = parser.parse_args()
+    if args.packrat is not None and args.packrat < 1:
+        parser.error("--packrat CACHE_SIZE must be at least 1")
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='noj_benchmarks')
+    if not os.path.isdir(data_dir):
+        os.makedirs(data_dir)
+    commit = git_commit()
+    results = {'commit': commit,
+               'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'python': platform.python_version(),
+               'platform': platform.platform(),
+               'seed': args.seed,
+               'benchmarks': dict()}
+    try:
+        paths = generate_data(data_dir, args)
+        out_path = os.path.join(data_dir, 'out' + sinks.EXTENSIONS[args.format])
+        runs = list()
+        if 'jmdict' in args.only:
+            runs.append(('jmdict', bench_jmdict,
+                         (paths['jmdict'], paths['examples'], out_path, args.format)))
+        if 'daijirin2' in args.only:
+            runs.append(('daijirin2', bench_daijirin2,
+                         (paths['daijirin2'], out_path, None, args.format)))
+            if args.packrat:
+                runs.append(('daijirin2_packrat', bench_daijirin2,
+                             (paths['daijirin2'], out_path, args.packrat, args.format)))
+        for name, func, func_args in runs:
+            report = run_isolated(func, *func_args)
+            results['benchmarks'][name] = report
+            print_report(name, report)
+    finally:
+        if args.data_dir is None:
+            shutil.rmtree(data_dir)
+
+    output = args.output
+    if output is None:
+        if not os.path.isdir(RESULTS_DIR):
+            os.makedirs(RESULTS_DIR)
+        output = os.path.join(RESULTS_DIR, 'benchmark-{}.json'.format(commit or 'unknown'))
+    with open(output, 'wb') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print "Results written to {}".format(output)
+
+    if args.compare:
+        with open(args.compare, 'rb') as f:
+            print_comparison(json.load(f), results)
+
+if __name__ == '__main__':
+    main()
@@ -1,285 +1,524 @@
-#!/usr/bin/env python
-# -*- coding: utf-8 -*-
-import codecs
-import os
-import sys
-from pyparsing import *
-from lxml import etree
-from textwrap import dedent
-from noj_converters.misc.uni_printer import UniPrinter
-import daijirin2_grammar as g
-
-__version__ = '1.0.0a'
-__schema_version__ = '1.0.0a'
-
-pp = UniPrinter(indent=4)
-
-NAMESPACE_URI = "http://www.naturalorderjapanese.com"
-NAMESPACE_PREFIX = "{" + NAMESPACE_URI + "}"
-XSI = "http://www.w3.org/2001/XMLSchema-instance"
-XSI_PREFIX = "{" + XSI + "}"
-SCHEMA_LOCATION = "http://www.naturalorderjapanese.com dictionary_schema-{}.xsd".format(__schema_version__)
-NSMAP = {None:  NAMESPACE_URI,
-         'xsi': XSI}
-
-class Daijrin2Converter(object):
-    def __init__(self, dump_path, out_path, error_path):
-        super(Daijrin2Converter, self).__init__()
-        self.dump_path = dump_path
-        self.out_path = out_path
-        self.error_path = error_path
-
-    def convert_generator(self):
-        errs = 0
-        ef = open(self.error_path, 'wb')
-        out = open(self.out_path, 'wb')
-
-        with codecs.open(self.dump_path, 'r', 'utf-8') as f:
-            with etree.xmlfile(out, encoding='utf-8') as xf:
-                xf.write_declaration()
-                with xf.element(NAMESPACE_PREFIX+'dictionary', nsmap=NSMAP,
-                                attrib={XSI_PREFIX+'schemaLocation': SCHEMA_LOCATION,
-                                        'schema_version': __schema_version__}): 
-                    xf.write("\n")
-                    entry_buffer = list()
-                    in_metadata = True
-                    for line in f:
-
-                        is_entry_header = g.ENTRY_HEADER_MATCHER.match(line)
-                        if is_entry_header:
-                            if in_metadata:
-                                in_metadata = False
-                                xml_meta = self.meta_to_xml(entry_buffer[:-1])
-                                xf.write(xml_meta, pretty_print=True)
-                            else:
-                                entry_lines = ''.join(entry_buffer)
-                                
-                                try:
-                                    res = (g.ENTRY_BLOCK + stringEnd).parseString(entry_lines)
-                                    xml_entry = self.entry_to_xml(res)
-                                    xf.write(xml_entry, pretty_print=True)
-                                except ParseException as e:
-                                    errs += 1
-                                    print "errs = {}".format(errs)
-                                    ef.write((u"{}\n".format(e)).encode('utf-8', errors='ignore'))
-                                    ef.write((entry_lines + u"\n").encode('utf-8', errors='ignore'))
-
-                            entry_buffer = list()
-                            yield f.tell()
-                        entry_buffer.append(line)
-
-    def entry_to_xml(self, pr):
-        xml_entry = etree.Element("entry", format="J-J1")
-
-        remove_punct_map = dict([(ord(p), None) for p in u"-・"])
-
-        xml_kana = etree.Element("kana")
-        xml_kana.text = pr.kana[0]
-        xml_entry.append(xml_kana)
-
-        if pr.g1:
-            for k in pr.surf:
-                kanji = etree.Element("kanji")
-                kanji.text = k
-                xml_entry.append(kanji)
-        else:
-            if pr.hist_surf_list:
-                for hist, surf in pr.hist_surf_list:
-                    for k in surf:
-                        kanji = etree.Element("kanji")
-                        kanji.text = k
-                        xml_entry.append(kanji)
-
-
-        if pr.acc:
-            accent = etree.Element("accent")
-            accent.text = ''.join(pr.acc)
-            xml_entry.append(accent)
-
-        # print
-        if pr.gsg:
-            xml_entry.append(self.grammar_subentry_group_to_xml(pr.gsg))
-        elif pr.msg:
-            xml_entry.append(self.meaning_subentry_group_to_xml(pr.msg))
-        elif pr.nsg:
-            xml_entry.append(self.no_subentry_group_to_xml(pr.nsg))
-        return xml_entry
-
-    def grammar_subentry_group_to_xml(self, pr):
-        # print "gsg"
-        # pp.pprint(pr.dump())
-        root_def = etree.Element("definition", group="grammar")
-        if pr.pre_def:
-            def_text = etree.Element("definition_text")
-            def_text.text = pr.pre_def[0]
-            root_def.append(def_text)
-        for se in pr.subentries:
-            # pp.pprint(se.dump())
-            sub_def = etree.Element("definition", group="subgrammar")
-            subdef_text = etree.Element("definition_text")
-            terms = list()
-            for t in se.terms:
-                terms.append(u"〔" + t + u"〕")
-            subdef_text.text = se.def_text + u"".join(terms)
-            sub_def.append(subdef_text)
-
-            # Go deeper
-            if se.msg:
-                sub_def.append(self.meaning_subentry_group_to_xml(se.msg))
-            elif se.nsg:
-                sub_def.append(self.no_subentry_group_to_xml(se.nsg))
-
-            root_def.append(sub_def)
-        return root_def
-
-    def meaning_subentry_group_to_xml(self, pr):
-        # print "msg"
-        # pp.pprint(pr.dump())
-        root_def = etree.Element("definition", group="meaning")
-        if pr.pre_def:
-            def_text = etree.Element("definition_text")
-            def_text.text = pr.pre_def[0]
-            root_def.append(def_text)
-        for se in pr.subentries:
-            # pp.pprint(se.dump())
-            sub_def = etree.Element("definition", group="submeaning")
-            # TODO might need to split the examples off
-            subdef_text = etree.Element("definition_text")
-            text, examples = se.def_text
-            subdef_text.text = text
-            sub_def.append(subdef_text)
-            self.examples_to_xml(examples, sub_def)
-
-            # Go deeper
-            if se.nsg:
-                sub_def.append(self.no_subentry_group_to_xml(se.nsg))
-
-            root_def.append(sub_def)
-        return root_def
-
-    def no_subentry_group_to_xml(self, pr):
-        # print "nsg"
-        if pr.multi_def:
-            return self.multi_def_to_xml(pr.multi_def)
-        else:
-            return self.single_def_to_xml(pr.sgl_def)
-
-    def multi_def_to_xml(self, pr):
-        # print "multidef"
-        # pp.pprint(pr.dump())
-        root_def = etree.Element("definition", group="multidefinition")
-        if pr.pre_def:
-            def_text = etree.Element("definition_text")
-            def_text.text = pr.pre_def[0]
-            root_def.append(def_text)
-        for d in pr.defs:
-            # TODO handle this properly
-            sub_def = etree.Element("definition")
-            self.definition_text_to_xml(d.def_text, sub_def)
-            root_def.append(sub_def)
-        return root_def
-
-    def single_def_to_xml(self, pr):
-        # print "sgl_def"
-        # pp.pprint(pr.dump())
-        root_def = etree.Element("definition")
-        # sub_def = etree.Element("definition")
-        # self.definition_text_to_xml(pr.def_text, sub_def)
-        # root_def.append(sub_def)
-        self.definition_text_to_xml(pr.def_text, root_def)
-        return root_def
-
-    def definition_text_to_xml(self, pr, subdef):
-        # print "def_text"
-        # print "--- here"
-        # pp.pprint(pr)
-        # print "--- fin"
-        # head
-        text, examples = pr['head']
-        subdef_text = etree.Element("definition_text")
-        subdef_text.text = text
-        subdef.append(subdef_text)
-        self.examples_to_xml(examples, subdef)
-        # body
-        if 'body' in pr:
-            subdef.set('group', 'subdefinition')
-            # print "body~~~~~"
-            for b in pr['body']:
-                # print b
-                subsub_def = etree.Element("definition", group="subsubdefinition")
-                text, examples = b['extract']
-                subsubdef_text = etree.Element("definition_text")
-                subsubdef_text.text = text
-                subsub_def.append(subsubdef_text)
-                self.examples_to_xml(examples, subsub_def)
-                subdef.append(subsub_def)
-
-    def examples_to_xml(self, examples, root_def):
-        for ex in examples:
-            usage_example = etree.Element('usage_example', type='UNKNOWN')
-            expression = etree.Element('expression')
-            expression.text = ex
-            usage_example.append(expression)
-            root_def.append(usage_example)
-
-    def meta_to_xml(self, meta_lines):
-        xml_meta = etree.Element("dictionary_meta")
-        has_title = False
-        for line in meta_lines:
-            line = line.rstrip()
-            s = line.split(u': ', 1)
-            if len(s) == 2:
-                key, value = s
-                if key == u'FORMAT':
-                    pass
-                elif key == u'TITLE':
-                    xml_name = etree.Element("name")
-                    xml_name.text = value
-                    xml_meta.append(xml_name)
-                    has_title = True
-                elif key == u'VERSION':
-                    xml_dump_version = etree.Element("dump_version")
-                    xml_dump_version.text = value
-                    xml_meta.append(xml_dump_version)
-        xml_convert_version = etree.Element("convert_version")
-        xml_convert_version.text = __version__
-        xml_meta.append(xml_convert_version)
-        if has_title == False:
-            raise Exception("No TITLE metadata.")
-
-        return xml_meta
-
-
-    # what does this do???
-    def entry_test(self):
-        print testentry
-        res = (g.ENTRY_BLOCK + stringEnd).parseString(testentry)
-        # pp.pprint(res.dump())
-        xml_entry = self.entry_to_xml(res)
-
-        print etree.tostring(xml_entry, pretty_print=True, encoding="UTF-8")
-        print
-
-    def __len__(self):
-        return os.path.getsize(self.dump_path)
-
-def main():
-    # self.entry_test()
-    dump_path = sys.argv[1] # TODO validate or change to FP
-    out_path = 'daijirin2_importable.xml'
-    error_path = 'errors.txt'
-    converter = Daijrin2Converter(dump_path, out_path, error_path)
-
-    import progressbar as pb
-    widgets = ['Converting: ', pb.Percentage(), ' ', pb.Bar(),
-               ' ', pb.Timer(), ' ']
-    pbar = pb.ProgressBar(widgets=widgets, maxval=len(converter)).start()
-
-    for i in converter.convert_generator():
-        pbar.update(i)
-    pbar.finish()
-
-
-if __name__ == '__main__':
-    main()
-
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import argparse
+import os
+import sqlite3
+import sys
+from noj_converters.misc.uni_printer import UniPrinter
+from noj_converters.misc.pool import run_in_pool, worker_state
+from noj_converters.misc.entry_tree import Node
+from noj_converters.misc import sinks
+from noj_converters.misc.compressed import (COMPRESSIONS, open_input, open_output,
+                                            compressed_offset, with_disk_offsets)
+from noj_converters.misc.checkpoint import CHECKPOINT_INTERVAL, Checkpoint
+from noj_converters.misc.stage_timer import NullTimer, StageTimer, profiled
+from noj_converters.misc.fragments import FragmentCache, fragment_stats
+from noj_converters.misc.pipeline import PIPELINE_QUEUE_SIZE, NullPipeline, Pipeline
+import daijirin2_records as r
+from entry_index import EntryIndex
+from parse_cache import PARSE_CACHE_SIZE, ParseCache
+
+__version__ = '1.0.0a'
+__schema_version__ = '1.0.0a'
+
+pp = UniPrinter(indent=4)
+
+NAMESPACE_URI = "http://www.naturalorderjapanese.com"
+NAMESPACE_PREFIX = "{" + NAMESPACE_URI + "}"
+XSI = "http://www.w3.org/2001/XMLSchema-instance"
+XSI_PREFIX = "{" + XSI + "}"
+SCHEMA_LOCATION = "http://www.naturalorderjapanese.com dictionary_schema-{}.xsd".format(__schema_version__)
+NSMAP = {None:  NAMESPACE_URI,
+         'xsi': XSI}
+
+class Daijrin2Converter(object):
+    def __init__(self, dump_path, out_path, error_path, timer=None, output_format='xml',
+                 pretty_print=True, checkpoint_interval=CHECKPOINT_INTERVAL, shards=None,
+                 parse_cache=None, pipeline=None):
+        super(Daijrin2Converter, self).__init__()
+        self.dump_path = dump_path
+        self.out_path = out_path
+        self.error_path = error_path
+        self.output_format = output_format
+        self.pretty_print = pretty_print
+        self.checkpoint_interval = checkpoint_interval
+        # A ShardedSink split, or None for a single output
+        self.shards = shards
+        # A ParseCache, or None to parse every entry
+        self.parse_cache = parse_cache
+        # A Pipeline to read and write in threads of their own
+        self.pipeline = pipeline or NullPipeline()
+        # Accents and term lists shared between entries; each pool worker
+        # has its own
+        self.accents = FragmentCache(u'', u'', u'')
+        self.terms = FragmentCache(u"〔", u"〕〔", u"〕")
+        # A StageTimer collects parse_cache/parse/transform/serialize times;
+        # all but serialize are only timed when converting with a single
+        # worker
+        self.timer = timer or NullTimer()
+
+    def convert_generator(self, workers=1, resume=False):
+        """Convert the dump, yielding the position reached in the file on
+        disk after each entry. With ``resume``, carry on from the last
+        checkpoint of an interrupted run, if there is one."""
+        errs = 0
+        checkpoint = Checkpoint(self.out_path, self.dump_path, self.checkpoint_interval,
+                                {'format': self.output_format, 'pretty_print': self.pretty_print,
+                                 'shards': self.shards and list(self.shards)})
+        state = checkpoint.load() if resume else None
+        resume_at = error_offset = None
+        if state is not None:
+            resume_at = state['output_offset']
+            error_offset = state['error_offset']
+            errs = state['errors']
+
+        with open_output(self.error_path, error_offset) as ef, open_input(self.dump_path) as f:
+            with sinks.open_sink(self.output_format, self.out_path, NAMESPACE_PREFIX+'dictionary',
+                                 {XSI_PREFIX+'schemaLocation': SCHEMA_LOCATION,
+                                  'schema_version': __schema_version__}, NSMAP,
+                                 self.pretty_print, resume_at, self.shards) as sink:
+                if state is None:
+                    blocks = self.entry_blocks(f)
+                    for meta_block, pos in blocks:
+                        xml_meta = self.meta_to_xml(meta_block.splitlines(True)[:-1])
+                        sink.write_meta(xml_meta)
+                        yield compressed_offset(f, pos)
+                        break
+                else:
+                    f.seek(state['input_offset'])
+                    blocks = self.entry_blocks(f, state['input_offset'])
+                    # The metadata was written before the checkpoint
+                    next(blocks, None)
+
+                # Each position is paired with the one on disk, which is
+                # yielded, while the reader has the file
+                blocks = self.timer.iterate('read', with_disk_offsets(f, blocks))
+                blocks = self.pipeline.read_ahead(blocks, 'read')
+                # A list, so that the writer, which may run in a thread of
+                # its own, can count
+                errs = [errs]
+
+                def write(converted):
+                    (pos, disk_pos), xml_entry, error = converted
+                    if error is not None:
+                        errs[0] += 1
+                        print "errs = {}".format(errs[0])
+                        ef.write(error.encode('utf-8', errors='ignore'))
+                        self.timer.end_entry(error.split(u'\n', 2)[1])
+                    else:
+                        with self.timer.stage('serialize'):
+                            sink.write(xml_entry)
+                        self.timer.end_entry(xml_entry)
+                    if checkpoint.due():
+                        ef.flush()
+                        checkpoint.save(sink, pos, errors=errs[0], error_offset=ef.tell())
+
+                with self.pipeline.write_behind(write, 'write') as writer:
+                    for converted in self.convert_blocks(blocks, workers):
+                        writer.put(converted)
+                        yield converted[0][1]
+        checkpoint.finish()
+        if workers <= 1:
+            self.timer.count('fragment_cache', *fragment_stats([self.accents, self.terms]))
+        if self.parse_cache is not None:
+            self.timer.count('parse_cache', *self.parse_cache.stats())
+
+    def entry_blocks(self, f, offset=0):
+        """Split the dump (opened in binary mode) into blocks starting at
+        each ``<INDENT=1>`` line.
+
+        Yields ``(text, pos)`` pairs, where ``pos`` is the byte offset
+        after the block. The first block holds the metadata lines in front
+        of the first entry. ``offset`` is where ``f`` is positioned when
+        reading on from a checkpoint.
+        """
+        return r.iter_entry_blocks(f, offset=offset)
+
+    def convert_blocks(self, blocks, workers=1):
+        """Convert entry blocks, in order, into ``<entry>`` elements.
+
+        Yields ``(pos, xml_entry, error)`` triples where exactly one of
+        ``xml_entry`` and ``error`` is set. With more than one worker the
+        blocks are parsed in a process pool; results still come back in
+        dump order.
+        """
+        if workers <= 1:
+            for entry_lines, pos in blocks:
+                xml_entry, error = self.convert_block(entry_lines)
+                yield pos, xml_entry, error
+            return
+
+        # Parsing a block takes several times as long as a JMdict entry
+        for chunk in run_in_pool(_pool_convert_chunk, blocks, workers, self, cost=4):
+            for pos, entry_tuple, error in chunk:
+                xml_entry = None
+                if entry_tuple is not None:
+                    xml_entry = Node.from_tuple(entry_tuple)
+                yield pos, xml_entry, error
+
+    def convert_block(self, entry_lines):
+        """Parse and convert a single entry block.
+
+        Returns ``(xml_entry, error)``; on a parse error ``xml_entry`` is
+        None and ``error`` holds the text destined for the error file.
+        """
+        # Cache lookups are timed apart, so that 'parse' only counts the
+        # entries actually parsed
+        parsed = None
+        if self.parse_cache is not None:
+            with self.timer.stage('parse_cache'):
+                parsed = self.parse_cache.get(entry_lines)
+        if parsed is None:
+            with self.timer.stage('parse'):
+                # The grammar is only built once an entry has to be parsed
+                grammar = r.grammar()
+                try:
+                    parsed = grammar.parse_entry_record(entry_lines)
+                except grammar.ParseException as e:
+                    # Failures are cached too, as (None, message)
+                    parsed = (None, u"{}\n".format(e))
+            if self.parse_cache is not None:
+                with self.timer.stage('parse_cache'):
+                    self.parse_cache.put(entry_lines, parsed)
+        header, body = parsed
+        if header is None:
+            return None, body + entry_lines + u"\n"
+        with self.timer.stage('transform'):
+            xml_entry = self.entry_to_xml(header, body)
+        return xml_entry, None
+
+    def entry_to_xml(self, header, body):
+        """Build the ``<entry>`` from an EntryHeader and a body record
+        (see ``parse_entry_record``)."""
+        xml_entry = Node("entry", format="J-J1")
+
+        remove_punct_map = dict([(ord(p), None) for p in u"-・"])
+
+        xml_kana = Node("kana")
+        xml_kana.text = header.kana
+        xml_entry.append(xml_kana)
+
+        # Only one of surf (ENTRY_HEADER_SUBGRAMMAR_1) and hist_surf_list
+        # (ENTRY_HEADER_SUBGRAMMAR_2) is set
+        if header.surf:
+            for k in header.surf:
+                kanji = Node("kanji")
+                kanji.text = k
+                xml_entry.append(kanji)
+        elif header.hist_surf_list:
+            for hist, surf in header.hist_surf_list:
+                for k in surf:
+                    kanji = Node("kanji")
+                    kanji.text = k
+                    xml_entry.append(kanji)
+
+
+        if header.acc:
+            accent = Node("accent")
+            accent.text = self.accents.join(header.acc)
+            xml_entry.append(accent)
+
+        # print
+        if isinstance(body, r.GrammarSubentryGroup):
+            with self.timer.stage('transform.grammar_subentry_group_to_xml'):
+                xml_entry.append(self.grammar_subentry_group_to_xml(body))
+        elif isinstance(body, r.MeaningSubentryGroup):
+            with self.timer.stage('transform.meaning_subentry_group_to_xml'):
+                xml_entry.append(self.meaning_subentry_group_to_xml(body))
+        elif body is not None:
+            with self.timer.stage('transform.no_subentry_group_to_xml'):
+                xml_entry.append(self.no_subentry_group_to_xml(body))
+        return xml_entry
+
+    def grammar_subentry_group_to_xml(self, gsg):
+        # print "gsg"
+        # pp.pprint(gsg)
+        root_def = Node("definition", group="grammar")
+        if gsg.pre_def is not None:
+            def_text = Node("definition_text")
+            def_text.text = gsg.pre_def
+            root_def.append(def_text)
+        for se in gsg.subentries:
+            # pp.pprint(se)
+            sub_def = Node("definition", group="subgrammar")
+            subdef_text = Node("definition_text")
+            terms = u""
+            if se.terms:
+                terms = self.terms.join(se.terms)
+            subdef_text.text = se.text + terms
+            sub_def.append(subdef_text)
+
+            # Go deeper
+            if se.msg:
+                sub_def.append(self.meaning_subentry_group_to_xml(se.msg))
+            elif se.nsg:
+                sub_def.append(self.no_subentry_group_to_xml(se.nsg))
+
+            root_def.append(sub_def)
+        return root_def
+
+    def meaning_subentry_group_to_xml(self, msg):
+        # print "msg"
+        # pp.pprint(msg)
+        root_def = Node("definition", group="meaning")
+        if msg.pre_def is not None:
+            def_text = Node("definition_text")
+            def_text.text = msg.pre_def
+            root_def.append(def_text)
+        for se in msg.subentries:
+            # pp.pprint(se)
+            sub_def = Node("definition", group="submeaning")
+            # TODO might need to split the examples off
+            subdef_text = Node("definition_text")
+            subdef_text.text = se.text
+            sub_def.append(subdef_text)
+            self.examples_to_xml(se.examples, sub_def)
+
+            # Go deeper
+            if se.nsg:
+                sub_def.append(self.no_subentry_group_to_xml(se.nsg))
+
+            root_def.append(sub_def)
+        return root_def
+
+    def no_subentry_group_to_xml(self, nsg):
+        # print "nsg"
+        if isinstance(nsg, r.MultiDefinition):
+            return self.multi_def_to_xml(nsg)
+        else:
+            return self.single_def_to_xml(nsg)
+
+    def multi_def_to_xml(self, multi_def):
+        # print "multidef"
+        # pp.pprint(multi_def)
+        root_def = Node("definition", group="multidefinition")
+        if multi_def.pre_def is not None:
+            def_text = Node("definition_text")
+            def_text.text = multi_def.pre_def
+            root_def.append(def_text)
+        for d in multi_def.defs:
+            # TODO handle this properly
+            sub_def = Node("definition")
+            self.definition_text_to_xml(d, sub_def)
+            root_def.append(sub_def)
+        return root_def
+
+    def single_def_to_xml(self, definition):
+        # print "sgl_def"
+        # pp.pprint(definition)
+        root_def = Node("definition")
+        # sub_def = Node("definition")
+        # self.definition_text_to_xml(definition, sub_def)
+        # root_def.append(sub_def)
+        self.definition_text_to_xml(definition, root_def)
+        return root_def
+
+    def definition_text_to_xml(self, definition, subdef):
+        # print "def_text"
+        # print "--- here"
+        # pp.pprint(definition)
+        # print "--- fin"
+        # head
+        subdef_text = Node("definition_text")
+        subdef_text.text = definition.text
+        subdef.append(subdef_text)
+        self.examples_to_xml(definition.examples, subdef)
+        # body
+        if definition.subdefinitions is not None:
+            subdef.set('group', 'subdefinition')
+            # print "body~~~~~"
+            for sub in definition.subdefinitions:
+                subsub_def = Node("definition", group="subsubdefinition")
+                subsubdef_text = Node("definition_text")
+                subsubdef_text.text = sub.text
+                subsub_def.append(subsubdef_text)
+                self.examples_to_xml(sub.examples, subsub_def)
+                subdef.append(subsub_def)
+
+    def examples_to_xml(self, examples, root_def):
+        for ex in examples:
+            usage_example = Node('usage_example', type='UNKNOWN')
+            expression = Node('expression')
+            expression.text = ex.expression
+            usage_example.append(expression)
+            root_def.append(usage_example)
+
+    def meta_to_xml(self, meta_lines):
+        xml_meta = Node("dictionary_meta")
+        has_title = False
+        for line in meta_lines:
+            line = line.rstrip()
+            s = line.split(u': ', 1)
+            if len(s) == 2:
+                key, value = s
+                if key == u'FORMAT':
+                    pass
+                elif key == u'TITLE':
+                    xml_name = Node("name")
+                    xml_name.text = value
+                    xml_meta.append(xml_name)
+                    has_title = True
+                elif key == u'VERSION':
+                    xml_dump_version = Node("dump_version")
+                    xml_dump_version.text = value
+                    xml_meta.append(xml_dump_version)
+        xml_convert_version = Node("convert_version")
+        xml_convert_version.text = __version__
+        xml_meta.append(xml_convert_version)
+        if has_title == False:
+            raise Exception("No TITLE metadata.")
+
+        return xml_meta
+
+
+    def convert_headword(self, headword, index=None):
+        """Parse and convert only the entries for ``headword``, found with
+        the dump's ``EntryIndex`` (built on first use).
+
+        Returns the ``(xml_entry, error)`` pairs of ``convert_block``.
+        """
+        if index is None:
+            index = EntryIndex(self.dump_path)
+        return [self.convert_block(block) for block in index.blocks(headword)]
+
+    def entry_test(self, headword, index=None):
+        """Print the conversion of each entry for ``headword``, or the
+        parse error followed by the entry's text."""
+        results = self.convert_headword(headword, index)
+        if not results:
+            print u"No entry for {}".format(headword).encode('utf-8')
+        for xml_entry, error in results:
+            if error is not None:
+                print error.encode('utf-8')
+            else:
+                print xml_entry.to_xml(self.pretty_print)
+                print
+
+    def __len__(self):
+        return os.path.getsize(self.dump_path)
+
+def _pool_convert_chunk(chunk):
+    """Convert a chunk of blocks in a pool worker of ``convert_blocks``."""
+    converter = worker_state()
+    results = list()
+    for entry_lines, pos in chunk:
+        xml_entry, error = converter.convert_block(entry_lines)
+        if xml_entry is not None:
+            xml_entry = xml_entry.to_tuple()
+        results.append((pos, xml_entry, error))
+    if converter.parse_cache is not None:
+        converter.parse_cache.flush()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a Daijirin2 dump to NOJ XML.")
+    parser.add_argument('dump_path') # TODO validate or change to FP
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of parser processes (default: 1)")
+    parser.add_argument('--packrat', type=int, nargs='?', const=r.PACKRAT_CACHE_SIZE,
+                        metavar='CACHE_SIZE',
+                        help="enable packrat parsing, caching at most CACHE_SIZE "
+                             "results (default: {})".format(r.PACKRAT_CACHE_SIZE))
+    parser.add_argument('--format', choices=sinks.FORMATS, default='xml',
+                        help="output format (default: xml)")
+    parser.add_argument('--compact', action='store_true',
+                        help="write the XML without line breaks and indentation")
+    parser.add_argument('--compress', choices=COMPRESSIONS,
+                        help="compress the output (not with --format sqlite)")
+    parser.add_argument('--shard', type=sinks.parse_shard_split, metavar='SPLIT:N',
+                        help="split the output into complete documents of N entries "
+                             "(entries:N), of about N bytes (size:N, K/M/G allowed) or "
+                             "into N shards by kana (kana:N), listed in a .shards.json file")
+    parser.add_argument('--timing-report', metavar='PATH',
+                        help="write per-stage times, entry latencies, the slowest entries "
+                             "and cache hits to PATH as JSON (requires --workers 1)")
+    parser.add_argument('--slowest', type=int, default=10, metavar='N',
+                        help="number of slowest entries in the timing report (default: 10)")
+    parser.add_argument('--cprofile', metavar='PATH',
+                        help="run under cProfile and dump the stats to PATH")
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_INTERVAL, metavar='N',
+                        help="save a checkpoint every N entries, 0 for none "
+                             "(default: {})".format(CHECKPOINT_INTERVAL))
+    parser.add_argument('--resume', action='store_true',
+                        help="carry on from the last checkpoint of an interrupted run")
+    parser.add_argument('--lookup', metavar='HEADWORD', action='append',
+                        type=lambda s: s.decode('utf-8'),
+                        help="only convert the entries for HEADWORD and print them; "
+                             "can be given more than once")
+    parser.add_argument('--entry-index', metavar='PATH',
+                        help="headword offset index for --lookup, built if missing or "
+                             "out of date (default: DUMP_PATH.sqlite)")
+    parser.add_argument('--parse-cache', nargs='?', const='', metavar='PATH',
+                        help="cache parsed entries in PATH, so that re-runs only parse the "
+                             "entries that changed (default: DUMP_NAME.parse-cache.sqlite "
+                             "in the working directory)")
+    parser.add_argument('--parse-cache-size', type=int, default=PARSE_CACHE_SIZE >> 20,
+                        metavar='MB',
+                        help="drop the least recently used cached parses beyond MB "
+                             "megabytes (default: {})".format(PARSE_CACHE_SIZE >> 20))
+    parser.add_argument('--pipeline', action='store_true',
+                        help="read and write in threads of their own, overlapping them "
+                             "with the conversion, and print queue depths and stall times")
+    parser.add_argument('--pipeline-queue', type=int, default=PIPELINE_QUEUE_SIZE, metavar='N',
+                        help="batches held between two pipeline stages "
+                             "(default: {})".format(PIPELINE_QUEUE_SIZE))
+    args = parser.parse_args()
+    if args.timing_report and args.workers > 1:
+        parser.error("--timing-report requires --workers 1")
+    if args.timing_report and args.pipeline:
+        parser.error("--timing-report cannot be used with --pipeline")
+    if args.compress and args.format == 'sqlite':
+        parser.error("--compress cannot be used with --format sqlite")
+    if args.resume and args.compress:
+        parser.error("--resume cannot be used with --compress")
+    if args.packrat is not None and args.packrat < 1:
+        parser.error("--packrat CACHE_SIZE must be at least 1")
+    if args.packrat is not None:
+        r.grammar().enable_packrat(args.packrat)
+    out_path = 'daijirin2_importable' + sinks.EXTENSIONS[args.format]
+    if args.compress:
+        out_path += '.' + args.compress
+    error_path = 'errors.txt'
+    timer = StageTimer(args.slowest) if args.timing_report else None
+    parse_cache = None
+    if args.parse_cache is not None:
+        # Like the output, in the working directory rather than next to the dump
+        cache_path = args.parse_cache or os.path.basename(args.dump_path) + '.parse-cache.sqlite'
+        try:
+            parse_cache = ParseCache(cache_path, args.parse_cache_size << 20)
+        except sqlite3.Error as e:
+            print >> sys.stderr, "Parsing every entry, {} can't be opened: {}".format(
+                cache_path, e)
+    pipeline = Pipeline(args.pipeline_queue) if args.pipeline else None
+    converter = Daijrin2Converter(args.dump_path, out_path, error_path, timer, args.format,
+                                  not args.compact, args.checkpoint_every, args.shard,
+                                  parse_cache, pipeline)
+
+    if args.lookup:
+        index = EntryIndex(args.dump_path, args.entry_index)
+        for headword in args.lookup:
+            converter.entry_test(headword, index)
+        if parse_cache is not None:
+            parse_cache.close()
+        return
+
+    import progressbar as pb
+    widgets = ['Converting: ', pb.Percentage(), ' ', pb.Bar(),
+               ' ', pb.Timer(), ' ']
+    pbar = pb.ProgressBar(widgets=widgets, maxval=len(converter)).start()
+
+    with profiled(args.cprofile):
+        for i in converter.convert_generator(workers=args.workers, resume=args.resume):
+            pbar.update(i)
+    pbar.finish()
+    for stats in converter.pipeline.queues:
+        print stats
+    if parse_cache is not None:
+        parse_cache.close()
+    if timer is not None:
+        timer.write_report(args.timing_report)
+
+
+if __name__ == '__main__':
+    main()
+
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import collections
+import re
+
+# The parts of the Daijirin2 format that need no pyparsing: splitting the
+# dump into entry blocks, and the records parsing an entry produces.
+# Importing daijirin2_grammar builds the whole pyparsing grammar, so the
+# converter, the parse cache and the entry index get at it through
+# grammar() when they actually parse, and not when e.g. every entry is
+# found in the parse cache.
+
+def grammar():
+    """Return the daijirin2_grammar module. The grammar is built when the
+    module is first imported and shared from then on."""
+    import daijirin2_grammar
+    return daijirin2_grammar
+
+# Default cache size of daijirin2_grammar.enable_packrat
+PACKRAT_CACHE_SIZE = 20000
+
+# Entry blocks #########################################################
+
+ENTRY_HEADER_MATCHER = re.compile(ur'<INDENT=1>')
+ENTRY_HEADER_BYTES = b'<INDENT=1>'
+ENTRY_SEPARATOR = b'\n' + ENTRY_HEADER_BYTES
+SPLIT_READ_SIZE = 1 << 20
+
+def iter_entry_blocks(f, read_size=SPLIT_READ_SIZE, offset=0):
+    """Split a dump opened in binary mode into entry blocks.
+
+    A block starts at every line beginning with ``<INDENT=1>``; the
+    first block holds the metadata in front of the first entry. Yields
+    ``(block, offset)`` pairs where ``block`` is the decoded text and
+    ``offset`` the byte position just past it. Boundaries are found on
+    the raw bytes, so each block is decoded exactly once.
+
+    ``offset`` is the position ``f`` is at when it doesn't start at the
+    beginning of the dump but at one of the offsets yielded earlier; the
+    metadata block is then empty.
+    """
+    buf = f.read(max(read_size, len(ENTRY_HEADER_BYTES)))
+    buf_offset = offset
+    start = 0
+    scan = 0
+    seen_header = buf.startswith(ENTRY_HEADER_BYTES)
+    if seen_header:
+        yield u'', offset
+    while True:
+        end = buf.find(ENTRY_SEPARATOR, scan)
+        if end != -1:
+            end += 1
+            yield buf[start:end].decode('utf-8'), buf_offset + end
+            seen_header = True
+            start = scan = end
+            continue
+        chunk = f.read(read_size)
+        if not chunk:
+            break
+        buf = buf[start:] + chunk
+        buf_offset += start
+        start = 0
+        scan = max(0, len(buf) - len(chunk) - len(ENTRY_SEPARATOR) + 1)
+    if seen_header and start < len(buf):
+        yield buf[start:].decode('utf-8'), buf_offset + len(buf)
+
+# Parse records ########################################################
+# The converter works on these namedtuples rather than on ParseResults:
+# they hold just what it reads, are cheap to build and to pickle, and can
+# be cached on disk (see parse_cache.py) and converted again without
+# pyparsing. Bump GRAMMAR_VERSION when they change shape.
+#
+# An entry body is a GrammarSubentryGroup, a MeaningSubentryGroup, or a
+# "no subentry group", which is either a MultiDefinition or a single
+# Definition; None when the body is empty. ``pre_def`` is the text in
+# front of the first subentry or numbered definition, or None.
+
+GRAMMAR_VERSION = '2'
+
+# The fields of an entry header line; see fast_entry_header and
+# entry_header_fields in daijirin2_grammar
+ENTRY_HEADER_FIELDS = ('kana', 'hist', 'acc', 'surf', 'hist_surf_list',
+                       'pos', 'conj', 'suru', 'lit')
+EntryHeader = collections.namedtuple('EntryHeader', ENTRY_HEADER_FIELDS)
+
+Example = collections.namedtuple('Example', 'expression')
+# A definition's text and its examples, split off by extract_examples
+DefinitionText = collections.namedtuple('DefinitionText', 'text examples')
+# subdefinitions is a list of DefinitionText for （ア）（イ）..., or None
+Definition = collections.namedtuple('Definition', 'text examples subdefinitions')
+MultiDefinition = collections.namedtuple('MultiDefinition', 'pre_def defs')
+# nsg is a MultiDefinition, a Definition or None
+MeaningSubentry = collections.namedtuple('MeaningSubentry', 'text examples nsg')
+MeaningSubentryGroup = collections.namedtuple('MeaningSubentryGroup', 'pre_def subentries')
+# Exactly one of msg and nsg is set
+GrammarSubentry = collections.namedtuple('GrammarSubentry', 'text terms msg nsg')
+GrammarSubentryGroup = collections.namedtuple('GrammarSubentryGroup', 'pre_def subentries')
+
+RECORD_TYPES = (EntryHeader, Example, DefinitionText, Definition, MultiDefinition,
+                MeaningSubentry, MeaningSubentryGroup, GrammarSubentry, GrammarSubentryGroup)
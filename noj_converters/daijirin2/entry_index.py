@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import re
+from noj_converters.misc.compressed import open_input
+from noj_converters.misc.sqlite_file import SourceIndex
+import daijirin2_records as r
+
+INDEX_VERSION = '1'
+# Entries inserted per executemany call while building
+INSERT_BATCH_SIZE = 10000
+
+head_re = re.compile(ur'<HEAD>(.*?)</HEAD>')
+
+class EntryIndex(SourceIndex):
+    """Headword -> byte offset and length of its entry blocks in a
+    Daijirin2 dump, backed by a SQLite file.
+
+    The index is built in one pass over the dump (split with
+    ``iter_entry_blocks``, nothing is parsed) and rebuilt whenever the
+    dump's size or mtime changes. A headword is the ``<HEAD>`` text of
+    the entry header; several entries can share one.
+    """
+
+    version = INDEX_VERSION
+
+    def __init__(self, dump_path, index_path=None):
+        self.dump_path = dump_path
+        super(EntryIndex, self).__init__(dump_path, index_path)
+
+    def fill(self, conn):
+        conn.execute('CREATE TABLE entries (id INTEGER PRIMARY KEY, head TEXT, '
+                     'offset INTEGER, length INTEGER)')
+        rows = list()
+        with open_input(self.dump_path) as f:
+            blocks = r.iter_entry_blocks(f)
+            meta_block, start = next(blocks, (None, 0))
+            for block, pos in blocks:
+                m = head_re.search(block.partition(u'\n')[0])
+                if m:
+                    rows.append((m.group(1), start, pos - start))
+                start = pos
+                if len(rows) >= INSERT_BATCH_SIZE:
+                    conn.executemany('INSERT INTO entries (head, offset, length) VALUES (?, ?, ?)', rows)
+                    rows = list()
+        conn.executemany('INSERT INTO entries (head, offset, length) VALUES (?, ?, ?)', rows)
+        conn.execute('CREATE INDEX entries_head ON entries (head)')
+
+    def locate(self, headword):
+        """Return the ``(offset, length)`` of every entry block for
+        ``headword``, in dump order."""
+        return self.conn.execute('SELECT offset, length FROM entries WHERE head = ? ORDER BY id',
+                                 (headword,)).fetchall()
+
+    def blocks(self, headword):
+        """Return the text of every entry block for ``headword``, as
+        ``iter_entry_blocks`` gives it. A compressed dump is decompressed
+        up to each block."""
+        blocks = list()
+        with open_input(self.dump_path) as f:
+            for offset, length in self.locate(headword):
+                f.seek(offset)
+                blocks.append(f.read(length).decode('utf-8'))
+        return blocks
+
+    def __contains__(self, headword):
+        row = self.conn.execute('SELECT 1 FROM entries WHERE head = ? LIMIT 1',
+                                (headword,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
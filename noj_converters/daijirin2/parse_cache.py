@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import marshal
+import os
+import sqlite3
+from noj_converters.misc.sqlite_file import SqliteFile
+import daijirin2_records as r
+
+CACHE_VERSION = '2'
+# Default bound on the size of the cached records
+PARSE_CACHE_SIZE = 512 << 20
+# Records written or touched per transaction
+WRITE_BATCH_SIZE = 1000
+# Editing any of these empties the cache
+GRAMMAR_SOURCES = ('daijirin2_grammar.py', 'daijirin2_records.py')
+
+def grammar_version():
+    """``GRAMMAR_VERSION`` plus a digest of the grammar's source, so that
+    editing the grammar invalidates the cache by itself. The sources are
+    read rather than imported, which would build the grammar."""
+    digest = hashlib.sha1(CACHE_VERSION + '/' + r.GRAMMAR_VERSION)
+    source_dir = os.path.dirname(os.path.abspath(r.__file__))
+    for name in GRAMMAR_SOURCES:
+        source_path = os.path.join(source_dir, name)
+        if os.path.exists(source_path):
+            with open(source_path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+RECORD_TYPES = dict((record_type.__name__, record_type) for record_type in r.RECORD_TYPES)
+
+def pack(value):
+    """Make parse records marshallable: each record becomes a one item
+    dict of its type name and its packed fields. Unlike pickling, this
+    doesn't depend on the name the grammar module was imported under."""
+    value_type = type(value)
+    if value_type is list:
+        return [pack(v) for v in value]
+    elif value_type is tuple:
+        return tuple(pack(v) for v in value)
+    elif value_type.__name__ in RECORD_TYPES and isinstance(value, tuple):
+        return {value_type.__name__: [pack(v) for v in value]}
+    return value
+
+def unpack(value):
+    value_type = type(value)
+    if value_type is list:
+        return [unpack(v) for v in value]
+    elif value_type is tuple:
+        return tuple(unpack(v) for v in value)
+    elif value_type is dict:
+        (name, fields), = value.items()
+        return RECORD_TYPES[name](*[unpack(v) for v in fields])
+    return value
+
+class ParseCache(SqliteFile):
+    """Parsed Daijirin2 entry blocks kept in a SQLite file, so that a
+    re-run only parses the entries that changed.
+
+    Records are keyed by the SHA-1 of the grammar version and the block
+    text, and hold the ``(header, body)`` of ``parse_entry_record``, or
+    ``(None, message)`` for a block that failed to parse, packed and
+    marshalled.
+    Every run is numbered; a record remembers the run that created it
+    and the last one that used it. Once the records add up to more than
+    ``max_size`` bytes, ``close`` drops the least recently used ones.
+    A cache written by another grammar version is emptied on open.
+
+    Each process (e.g. pool workers) opens its own connection, and
+    writes are batched, so ``flush`` must be called before a worker's
+    results are relied upon.
+    """
+
+    def __init__(self, path, max_size=PARSE_CACHE_SIZE):
+        super(ParseCache, self).__init__(path)
+        self.max_size = max_size
+        self.version = grammar_version()
+        self._inserts = list()
+        self._touches = list()
+        self.run = self.start_run()
+
+    def connect(self):
+        # A new process drops the writes it inherited
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.execute('PRAGMA synchronous = OFF')
+        self._inserts = list()
+        self._touches = list()
+        return conn
+
+    def __getstate__(self):
+        state = super(ParseCache, self).__getstate__()
+        state.update(_inserts=list(), _touches=list())
+        return state
+
+    def start_run(self):
+        conn = self.conn
+        # WAL lets pool workers read while another one writes
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        conn.execute('CREATE TABLE IF NOT EXISTS records (key BLOB PRIMARY KEY, record BLOB, '
+                     'size INTEGER, created INTEGER, used INTEGER)')
+        meta = dict(conn.execute('SELECT name, value FROM meta').fetchall())
+        if meta.get('version') != self.version:
+            conn.execute('DELETE FROM records')
+        run = int(meta.get('run', 0)) + 1
+        conn.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', [
+            ('version', self.version), ('run', str(run))])
+        conn.commit()
+        return run
+
+    def key(self, entry_lines):
+        return sqlite3.Binary(hashlib.sha1(self.version + entry_lines.encode('utf-8')).digest())
+
+    def get(self, entry_lines):
+        """Return the cached parse of ``entry_lines``, or None."""
+        key = self.key(entry_lines)
+        row = self.conn.execute('SELECT record, used FROM records WHERE key = ?',
+                                (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] != self.run:
+            self._touches.append((self.run, key))
+            if len(self._touches) >= WRITE_BATCH_SIZE:
+                self.flush()
+        return unpack(marshal.loads(str(row[0])))
+
+    def put(self, entry_lines, parsed):
+        data = marshal.dumps(pack(parsed))
+        self.conn # after a fork, drops the inherited writes first
+        self._inserts.append((self.key(entry_lines), sqlite3.Binary(data), len(data),
+                              self.run, self.run))
+        if len(self._inserts) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Write this process's pending records and uses."""
+        conn = self.conn
+        if self._inserts or self._touches:
+            conn.executemany('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)',
+                             self._inserts)
+            conn.executemany('UPDATE records SET used = ? WHERE key = ?', self._touches)
+            conn.commit()
+            self._inserts = list()
+            self._touches = list()
+
+    def stats(self):
+        """Return ``(hits, misses)`` of this run over all processes,
+        counting distinct blocks; workers must have flushed."""
+        self.flush()
+        hits, = self.conn.execute('SELECT COUNT(*) FROM records WHERE used = ? AND created < ?',
+                                  (self.run, self.run)).fetchone()
+        misses, = self.conn.execute('SELECT COUNT(*) FROM records WHERE created = ?',
+                                    (self.run,)).fetchone()
+        return hits, misses
+
+    def size(self):
+        return self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM records').fetchone()[0]
+
+    def evict(self):
+        """Drop the least recently used records until the rest fit in
+        ``max_size``. Returns the number of records dropped."""
+        self.flush()
+        excess = self.size() - self.max_size
+        if excess <= 0:
+            return 0
+        keys = list()
+        rows = self.conn.execute('SELECT key, size FROM records ORDER BY used, rowid').fetchall()
+        for key, size in rows:
+            if excess <= 0:
+                break
+            keys.append((key,))
+            excess -= size
+        self.conn.executemany('DELETE FROM records WHERE key = ?', keys)
+        self.conn.commit()
+        return len(keys)
+
+    def close(self):
+        if self._conn is not None and self._pid == os.getpid():
+            self.evict()
+        super(ParseCache, self).close()
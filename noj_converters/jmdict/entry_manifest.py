@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import marshal
+import sqlite3
+from lxml import etree
+from noj_converters.misc.entry_tree import Node
+
+# Bump whenever convert_entry's output changes for the same input
+MANIFEST_VERSION = '2'
+# Stands in for a missing optional part when hashing example components
+NONE = u'\x00'
+
+def entry_digest(entry_xml, example_dict):
+    """Hash a source ``<entry>`` together with the examples it can link to.
+
+    Every keb and reb is looked up in ``example_dict``, which is a
+    superset of what ``convert_entry`` uses. An edit to an example
+    therefore also changes the digest of every entry it could end up in.
+    """
+    h = hashlib.sha1(etree.tostring(entry_xml, with_tail=False))
+    keys = [xml.text for xml in entry_xml.iterfind('k_ele/keb')]
+    keys.extend(xml.text for xml in entry_xml.iterfind('r_ele/reb'))
+    parts = list()
+    for key in sorted(set(keys)):
+        comps = example_dict.get(key)
+        if not comps:
+            continue
+        parts.append(key)
+        for comp in comps:
+            expression, meaning = comp.sentence
+            parts.extend((expression, meaning, comp.reading or NONE, unicode(comp.defnum),
+                          comp.conj or NONE, u'~' if comp.validated else NONE))
+    if parts:
+        h.update(u'\t'.join(parts).encode('utf-8'))
+    return h.hexdigest()
+
+def dump_entry(xml_entry):
+    """Serialize a converted entry for the manifest."""
+    return marshal.dumps(xml_entry.to_tuple())
+
+def load_entry(data):
+    return Node.from_tuple(marshal.loads(data))
+
+class EntryManifest(object):
+    """Sidecar store of ``ent_seq`` -> (digest, converted entry).
+
+    ``get`` returns the earlier conversion when the digest still
+    matches. ``put`` records a new one, and ``finish`` drops the entries
+    that were not seen in this run, i.e. those removed from JMdict. The
+    manifest is cleared when ``MANIFEST_VERSION`` or the converter
+    version changes.
+    """
+
+    def __init__(self, path, converter_version):
+        super(EntryManifest, self).__init__()
+        self.path = path
+        self.version = MANIFEST_VERSION + '/' + converter_version
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        row = self.conn.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        if row is None or row[0] != self.version:
+            self.conn.execute('DROP TABLE IF EXISTS entries')
+            self.conn.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('version', self.version))
+        self.conn.execute('CREATE TABLE IF NOT EXISTS entries '
+                          '(ent_seq INTEGER PRIMARY KEY, digest TEXT, entry BLOB)')
+        self.conn.commit()
+        self.conn.execute('CREATE TEMP TABLE seen (ent_seq INTEGER PRIMARY KEY)')
+        self.stats = dict.fromkeys(('unchanged', 'changed', 'added', 'removed'), 0)
+
+    def get(self, ent_seq, digest):
+        self.conn.execute('INSERT OR IGNORE INTO seen VALUES (?)', (ent_seq,))
+        row = self.conn.execute('SELECT digest, entry FROM entries WHERE ent_seq = ?',
+                                (ent_seq,)).fetchone()
+        if row is None:
+            self.stats['added'] += 1
+            return None
+        if row[0] != digest:
+            self.stats['changed'] += 1
+            return None
+        self.stats['unchanged'] += 1
+        return load_entry(str(row[1]))
+
+    def put(self, ent_seq, digest, xml_entry):
+        self.conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)',
+                          (ent_seq, digest, sqlite3.Binary(dump_entry(xml_entry))))
+
+    def finish(self):
+        """Drop entries not seen since the manifest was opened and commit."""
+        cursor = self.conn.execute('DELETE FROM entries WHERE ent_seq NOT IN (SELECT ent_seq FROM seen)')
+        self.stats['removed'] = cursor.rowcount
+        self.conn.commit()
+        self.conn.close()
+        return self.stats
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+import codecs
+import hashlib
+import itertools
+import re
+from noj_converters.misc.compressed import open_input
+from noj_converters.misc.sqlite_file import SourceIndex
+
+INDEX_VERSION = '1'
+HASH_BLOCK_SIZE = 1 << 20
+
+comment_re = re.compile(ur'#ID=\d.*')
+component_re = re.compile(ur"(?P<base>.+?)(\((?P<reading>.*?)\))?(\[(?P<defnum>\d*?)\])?({(?P<conj>.*?)})?(?P<validated>~)?$")
+
+def iter_examples(example_path):
+    """Parse a Tanaka Corpus examples file.
+
+    Yields one ``(expression, meaning, components)`` triple per B-line,
+    where ``expression``/``meaning`` come from the A-line above it and
+    ``components`` lists ``(key, reading, defnum, conj, validated)`` for
+    each component. ``key`` is the headword the component refers to;
+    missing optional parts are None.
+    """
+    expression = None
+    meaning = None
+    with open_input(example_path) as raw:
+        f = codecs.getreader('euc-jp')(raw)
+        for line in f:
+            line = line.rstrip()
+            if line.startswith(u'A: '):
+                without_comments = re.sub(comment_re, u"", line[3:])
+                expression, meaning = without_comments.split(u'\t')
+            else:
+                comps = list()
+                components = line[3:].split(u" ")
+                for c in components:
+                    m = component_re.match(c)
+                    if m:
+                        defnum = m.group("defnum")
+                        if defnum is not None:
+                            defnum = int(defnum)
+                        comps.append((m.group("base"), m.group("reading"), defnum,
+                                      m.group("conj"), m.group("validated") is not None))
+                if comps:
+                    yield expression, meaning, comps
+
+class ExampleComponent(object):
+    """A B-line component pointing at its sentence in the sentence table.
+
+    Supports the dict-style access ``convert_entry`` and
+    ``convert_example`` use (``comp['reading']``, ``'validated' in comp``,
+    ...). Optional parts that are missing read as absent keys.
+    """
+    __slots__ = ('sentence', 'reading', 'defnum', 'conj', 'validated')
+
+    def __init__(self, sentence, reading, defnum, conj, validated):
+        self.sentence = sentence
+        self.reading = reading
+        self.defnum = defnum
+        self.conj = conj
+        self.validated = validated
+
+    def __getitem__(self, key):
+        if key == 'reading':
+            value = self.reading
+        elif key == 'defnum':
+            value = self.defnum
+        elif key == 'expression':
+            return self.sentence[0]
+        elif key == 'meaning':
+            return self.sentence[1]
+        elif key == 'validated':
+            value = True if self.validated else None
+        elif key == 'conj':
+            value = self.conj
+        else:
+            value = None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        if key == 'reading':
+            return self.reading is not None
+        elif key == 'defnum':
+            return self.defnum is not None
+        elif key == 'validated':
+            return self.validated
+        elif key == 'conj':
+            return self.conj is not None
+        return key in ('expression', 'meaning')
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+class ExampleStore(object):
+    """In-memory headword -> example components mapping.
+
+    Each sentence (expression, meaning pair) is stored once in
+    ``sentences``; components only hold a reference to it. Repeated
+    readings and conjugations share a single string as well.
+    """
+
+    def __init__(self):
+        super(ExampleStore, self).__init__()
+        self.sentences = list()
+        self.components = dict()
+        self._strings = dict()
+
+    def add(self, expression, meaning, comps):
+        sentence = (expression, meaning)
+        self.sentences.append(sentence)
+        shared = self._strings.setdefault
+        components = self.components
+        for key, reading, defnum, conj, validated in comps:
+            if reading is not None:
+                reading = shared(reading, reading)
+            if conj is not None:
+                conj = shared(conj, conj)
+            comp = ExampleComponent(sentence, reading, defnum, conj, validated)
+            if key in components:
+                components[key].append(comp)
+            else:
+                components[key] = [comp]
+
+    def __contains__(self, key):
+        return key in self.components
+
+    def __getitem__(self, key):
+        return self.components[key]
+
+    def get(self, key, default=None):
+        return self.components.get(key, default)
+
+    def iteritems(self):
+        return self.components.iteritems()
+
+    def __len__(self):
+        return len(self.components)
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+class ExampleIndex(SourceIndex):
+    """Headword -> example components, backed by a SQLite file.
+
+    The index is built once from the examples file and rebuilt whenever
+    the source changes. A size or mtime change alone triggers a content
+    hash check, so touching the file does not force a rebuild. Lookups
+    go to disk lazily; the object can be used in place of the
+    ``ExampleStore`` returned by ``load_examples``.
+    """
+
+    version = INDEX_VERSION
+
+    def __init__(self, example_path, index_path=None):
+        self.example_path = example_path
+        super(ExampleIndex, self).__init__(example_path, index_path)
+
+    def same_source(self, meta, size, mtime):
+        if meta.get('size') != size or meta.get('sha1') != file_hash(self.example_path):
+            return False
+        with self.conn:
+            self.conn.execute('UPDATE meta SET value = ? WHERE name = ?', (mtime, 'mtime'))
+        return True
+
+    def extra_meta(self):
+        return [('sha1', file_hash(self.example_path))]
+
+    def fill(self, conn):
+        conn.execute('CREATE TABLE sentences (id INTEGER PRIMARY KEY, expression TEXT, meaning TEXT)')
+        conn.execute('CREATE TABLE components (key TEXT, sentence_id INTEGER, reading TEXT, '
+                     'defnum INTEGER, conj TEXT, validated INTEGER)')
+        sentences = list()
+        components = list()
+        for expression, meaning, comps in iter_examples(self.example_path):
+            sentences.append((len(sentences) + 1, expression, meaning))
+            for key, reading, defnum, conj, validated in comps:
+                components.append((key, len(sentences), reading, defnum, conj, int(validated)))
+        conn.executemany('INSERT INTO sentences VALUES (?, ?, ?)', sentences)
+        conn.executemany('INSERT INTO components VALUES (?, ?, ?, ?, ?, ?)', components)
+        conn.execute('CREATE INDEX components_key ON components (key)')
+
+    def __contains__(self, key):
+        row = self.conn.execute('SELECT 1 FROM components WHERE key = ? LIMIT 1',
+                                (key,)).fetchone()
+        return row is not None
+
+    def __getitem__(self, key):
+        rows = self.conn.execute(
+            'SELECT s.expression, s.meaning, c.reading, c.defnum, c.conj, c.validated '
+            'FROM components c JOIN sentences s ON s.id = c.sentence_id '
+            'WHERE c.key = ? ORDER BY c.rowid', (key,)).fetchall()
+        if not rows:
+            raise KeyError(key)
+        return [ExampleComponent((expression, meaning), reading, defnum, conj, bool(validated))
+                for expression, meaning, reading, defnum, conj, validated in rows]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def iteritems(self):
+        """Yield ``(key, components)`` for every key, in key order."""
+        rows = self.conn.execute(
+            'SELECT c.key, s.expression, s.meaning, c.reading, c.defnum, c.conj, c.validated '
+            'FROM components c JOIN sentences s ON s.id = c.sentence_id '
+            'ORDER BY c.key, c.rowid')
+        for key, group in itertools.groupby(rows, lambda row: row[0]):
+            yield key, [ExampleComponent((expression, meaning), reading, defnum, conj, bool(validated))
+                        for key, expression, meaning, reading, defnum, conj, validated in group]
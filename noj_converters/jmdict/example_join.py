@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+import codecs
+from collections import defaultdict
+from lxml import etree
+from noj_converters.misc.compressed import open_input
+from noj_converters.misc.streaming import iter_released
+
+NO_EXAMPLES = ()
+
+def entry_key_sets(entry_xml):
+    """Return the ``(kana_set, kanji_set)`` of a JMdict ``<entry>``.
+
+    Same rules as ``convert_entry``: readings marked ``re_nokanji`` are
+    left out, and both sets are filled in document order so that they
+    iterate in the same order as the ones ``convert_entry`` builds.
+    """
+    kana_set = set()
+    for r_ele_xml in entry_xml.iterfind('r_ele'):
+        if r_ele_xml.find('re_nokanji') is None:
+            kana_set.add(r_ele_xml.findtext('reb'))
+    kanji_set = set()
+    for keb_xml in entry_xml.iterfind('k_ele/keb'):
+        kanji_set.add(keb_xml.text)
+    return kana_set, kanji_set
+
+def sense_examples(defnum_to_examples, sense_count):
+    """Split example components grouped by ``defnum`` into those shown for
+    the whole entry and those shown for each sense.
+
+    Components without a defnum go with the entry when it has several
+    senses and with its only sense otherwise. Returns
+    ``(entry_examples, [sense_1_examples, ...])``.
+    """
+    entry_examples = NO_EXAMPLES
+    if sense_count > 1:
+        entry_examples = defnum_to_examples.get(None, NO_EXAMPLES)
+    senses = list()
+    for sense_num in range(sense_count):
+        examples_for_defnum = list()
+        if sense_count == 1 and None in defnum_to_examples:
+            examples_for_defnum.extend(defnum_to_examples[None])
+        if (sense_num + 1) in defnum_to_examples:
+            examples_for_defnum.extend(defnum_to_examples[sense_num + 1])
+        senses.append(examples_for_defnum)
+    return entry_examples, senses
+
+class ExampleJoin(object):
+    """Example assignments for every JMdict entry, computed up front.
+
+    One pass over JMdict collects each entry's key set. One pass over
+    the example components then assigns every component to the entries
+    and senses ``convert_entry`` would put it in, in the same order.
+    The same pass records unmatched components (no entry, or no entry
+    with that reading, or no sense with that number) and ambiguous
+    ones (taken by more than one entry).
+    """
+
+    def __init__(self, jmdict_path, example_dict):
+        super(ExampleJoin, self).__init__()
+        self.assignments = dict()
+        self.unmatched = list()
+        self.ambiguous = list()
+        self._join(jmdict_path, example_dict)
+
+    def _join(self, jmdict_path, example_dict):
+        ent_seqs = list()
+        kana_sets = list()
+        sense_counts = list()
+        entries_by_key = defaultdict(list)
+        with open_input(jmdict_path) as f:
+            events = etree.iterparse(f, tag=('entry'), resolve_entities=False)
+            for action, elem in iter_released(events):
+                kana_set, kanji_set = entry_key_sets(elem)
+                key_set = kana_set if len(kanji_set) == 0 else kanji_set
+                entry = len(ent_seqs)
+                for rank, key in enumerate(key_set):
+                    entries_by_key[key].append((entry, rank))
+                ent_seqs.append(elem.findtext('ent_seq'))
+                kana_sets.append(kana_set)
+                sense_counts.append(len(elem.findall('sense')))
+
+        grouped = defaultdict(lambda: defaultdict(list))
+        for key, comps in example_dict.iteritems():
+            targets = entries_by_key.get(key)
+            for seq, comp in enumerate(comps):
+                if not targets:
+                    self.unmatched.append((key, comp, 'no entry'))
+                    continue
+                matched = [(target, rank) for target, rank in targets
+                           if comp.reading is None or comp.reading in kana_sets[target]]
+                if not matched:
+                    self.unmatched.append((key, comp, 'reading'))
+                    continue
+                if len(matched) > 1:
+                    self.ambiguous.append((key, comp, [ent_seqs[target] for target, rank in matched]))
+                for entry, rank in matched:
+                    grouped[entry][comp.defnum].append((rank, seq, key, comp))
+
+        for entry, by_defnum in grouped.iteritems():
+            sense_count = sense_counts[entry]
+            defnum_to_examples = dict()
+            for defnum, ranked in by_defnum.iteritems():
+                ranked.sort()
+                defnum_to_examples[defnum] = [comp for rank, seq, key, comp in ranked]
+                if defnum is not None and not 1 <= defnum <= sense_count:
+                    reason = u'no sense {} in {}'.format(defnum, ent_seqs[entry])
+                    self.unmatched.extend((key, comp, reason) for rank, seq, key, comp in ranked)
+            self.assignments[ent_seqs[entry]] = sense_examples(defnum_to_examples, sense_count)
+
+    def get(self, ent_seq, sense_count):
+        """Return ``(entry_examples, sense_examples)`` for an entry."""
+        assignment = self.assignments.get(ent_seq)
+        if assignment is None:
+            return NO_EXAMPLES, [NO_EXAMPLES] * sense_count
+        return assignment
+
+    def write_report(self, path):
+        """Write the unmatched and ambiguous components as tab separated lines."""
+        with codecs.open(path, 'w', 'utf-8') as f:
+            f.write(u'# unmatched: {}\n'.format(len(self.unmatched)))
+            for key, comp, reason in self.unmatched:
+                f.write(u'\t'.join([key, comp.reading or u'', unicode(comp.defnum or u''),
+                                    reason, comp.sentence[0]]) + u'\n')
+            f.write(u'# ambiguous: {}\n'.format(len(self.ambiguous)))
+            for key, comp, ent_seqs in self.ambiguous:
+                f.write(u'\t'.join([key, comp.reading or u'', unicode(comp.defnum or u''),
+                                    u','.join(ent_seqs), comp.sentence[0]]) + u'\n')
@@ -1,386 +1,659 @@
-# -*- coding: utf-8 -*-
-from collections import defaultdict
-import codecs
-import os
-import re
-from pyparsing import *
-import progressbar as pb
-from lxml import etree
-from textwrap import dedent
-from noj_converters.misc.uni_printer import UniPrinter
-
-__version__ = '1.0.0a'
-__schema_version__ = '1.0.0a'
-
-pp = UniPrinter(indent=4)
-
-NAMESPACE_URI = "http://www.naturalorderjapanese.com"
-NAMESPACE_PREFIX = "{" + NAMESPACE_URI + "}"
-XSI = "http://www.w3.org/2001/XMLSchema-instance"
-XSI_PREFIX = "{" + XSI + "}"
-SCHEMA_LOCATION = "http://www.naturalorderjapanese.com dictionary_schema-{}.xsd".format(__schema_version__)
-NSMAP = {None:  NAMESPACE_URI,
-         'xsi': XSI}
-
-comment_re = re.compile(ur'#ID=\d.*')
-component_re = re.compile(ur"(?P<base>.+?)(\((?P<reading>.*?)\))?(\[(?P<defnum>\d*?)\])?({(?P<conj>.*?)})?(?P<validated>~)?$")
-
-def load_examples(example_path):
-    example_dict = defaultdict(list)
-    expression = None
-    meaning = None
-    with codecs.open(example_path, 'r', 'euc-jp') as f:
-        for line in f:
-            line = line.rstrip()
-            if line.startswith(u'A: '):
-                without_comments = re.sub(comment_re, u"", line[3:])
-                expression, meaning = without_comments.split(u'\t')
-            else:
-                components = line[3:].split(u" ")
-                for c in components:
-                    m = component_re.match(c)
-                    if m:
-                        key = m.group("base")
-                        comp = dict()
-                        comp["expression"] = expression
-                        comp["meaning"] = meaning
-                        if m.group("reading") is not None:
-                            comp['reading'] = m.group("reading")
-                        if m.group("defnum") is not None:
-                            comp['defnum'] = int(m.group("defnum"))
-                        if m.group("conj") is not None:
-                            comp['conj'] = m.group("conj")
-                        if m.group("validated") is not None:
-                            comp['validated'] = True
-                        # print c, m
-                        # print str(m.groups()).decode("unicode-escape")
-                        example_dict[key].append(comp)
-    return example_dict
-
-def unescape_entities(entity_line):
-    translation_table = dict.fromkeys(map(ord, '&;'), None)
-    return entity_line.translate(translation_table)
-
-def create_meta(jmdict_path):
-    xml_meta = etree.Element("dictionary_meta")
-
-    # name
-    xml_name = etree.Element('name')
-    xml_name.text = "JMDict/EDICT + Examples"
-    xml_meta.append(xml_name)
-
-    # dump_version
-    pass # no dump_version
-
-    # convert_version
-    xml_convert_version = etree.Element('convert_version')
-    xml_convert_version.text = __version__
-    xml_meta.append(xml_convert_version)
-
-    # date
-    date = None
-    with codecs.open(jmdict_path, 'r', 'utf-8') as f:
-        for line in f:
-            m = re.match(r'<!-- JMdict created: (.*?) -->', line)
-            if m:
-                date = m.group(1)
-                break
-        else:
-            raise Exception("Created date not found.")
-    xml_date = etree.Element('date')
-    xml_date.text = date
-    xml_meta.append(xml_date)
-
-    # extra
-    pass # no extra
-
-    return xml_meta
-    
-
-def convert_entry(entry_xml, example_dict):
-    xml_entry = etree.Element("entry", format="J-E1")
-    # print etree.tostring(entry_xml, pretty_print=True, encoding='utf-8')
-
-    # convert "ent_seq"
-    # MAYBE incorporate later
-    # ent_seq_xml = entry_xml.find('ent_seq')
-    # xml_entry.set('orig_id', ent_seq_xml.text)
-
-    # convert "r_ele+"
-    kana_set = set()
-    r_ele_list = entry_xml.findall('r_ele')
-    for r_ele_xml in r_ele_list:
-        # convert reb
-        reb_xml = r_ele_xml.find('reb')
-        xml_kana = etree.Element("kana")
-        xml_kana.text = reb_xml.text
-
-        # convert re_nokanji
-        re_nokanji = r_ele_xml.find('re_nokanji')
-        if re_nokanji is not None:
-            continue
-
-        # TODO: handle this properly
-
-        # convert re_restr*
-        pass
-        # convert re_inf*
-        pass
-        # convert re_pri*
-        pass
-
-        kana_set.add(reb_xml.text)
-        xml_entry.append(xml_kana)
-
-    # convert "k_ele*"
-    kanji_set = set()
-    k_ele_list = entry_xml.findall('k_ele')
-    for k_ele_xml in k_ele_list:
-        # convert keb
-        keb_xml = k_ele_xml.find('keb')
-        xml_kanji = etree.Element("kanji")
-        xml_kanji.text = keb_xml.text
-
-        # TODO: handle this properly
-
-        # convert ke_inf*
-        pass
-        # convert ke_pri*
-        pass
-
-        kanji_set.add(keb_xml.text)
-        xml_entry.append(xml_kanji)
-
-    # Find candidate example sentences
-    defnum_to_examples = defaultdict(list)
-    key_set = kana_set if len(kanji_set) == 0 else kanji_set
-    for key in key_set:
-        if key in example_dict:
-            for comp in example_dict[key]:
-                if 'reading' in comp and comp['reading'] not in kana_set:
-                    continue
-                if 'defnum' in comp:
-                    defnum_to_examples[comp['defnum']].append(comp)
-                else:
-                    defnum_to_examples[None].append(comp)
-
-
-    # convert "info?"
-    pass # not using
-
-    # convert "sense+"
-    sense_list = entry_xml.findall('sense')
-    append_to = xml_entry
-    if len(sense_list) > 1:
-        append_to = etree.Element('definition', group="multidefinition")
-        if None in defnum_to_examples:
-            for comp in defnum_to_examples[None]:
-                xml_ue = convert_example(comp)
-                append_to.append(xml_ue)
-        xml_entry.append(append_to)
-
-    for sense_num, sense_xml in enumerate(sense_list):
-        examples_for_defnum = list()
-        if len(sense_list) == 1 and None in defnum_to_examples:
-            examples_for_defnum.extend(defnum_to_examples[None])
-        if (sense_num + 1) in defnum_to_examples:
-            examples_for_defnum.extend(defnum_to_examples[sense_num + 1])
-        xml_definition = convert_sense(sense_xml, examples_for_defnum)
-        append_to.append(xml_definition)
-
-    return xml_entry
-
-def convert_example(comp):
-    xml_ue = etree.Element('usage_example', type="SENTENCE")
-
-    xml_expression = etree.Element('expression')
-    xml_expression.text = comp['expression']
-    xml_ue.append(xml_expression)
-
-    xml_meaning = etree.Element('meaning')
-    xml_meaning.text = comp['meaning']
-    xml_ue.append(xml_meaning)
-
-    if 'validated' not in comp:
-        xml_ue.set('validated', 'false')
-    return xml_ue
-
-def convert_sense(sense_xml, example_list):
-    definition_text_parts = list()
-    xml_definition = etree.Element('definition')
-
-    stag_str_list = list()
-
-    # convert stagk*
-    stagk_list = sense_xml.findall('stagk')
-    if stagk_list:
-        stagk_str_list = list()
-        for stagk_xml in stagk_list:
-            stag_str_list.append(stagk_xml.text)
-
-    # convert stagr*
-    stagr_list = sense_xml.findall('stagr')
-    if stagr_list:
-        stagr_str_list = list()
-        for stagr_xml in stagr_list:
-            stag_str_list.append(stagr_xml.text)
-
-    if stag_str_list:
-        stag_line = '(' + ', '.join(stag_str_list) + ' only)'
-        definition_text_parts.append(stag_line)
-
-    # convert pos*
-    pos_list = sense_xml.findall('pos')
-    if pos_list:
-        pos_str_list = list()
-        for pos_xml in pos_list:
-            pos_str = str(pos_xml[0])
-            pos_str = pos_str.translate(None, '&;')
-            pos_str_list.append(pos_str)
-        pos_line = '(' + ','.join(pos_str_list) + ')'
-        definition_text_parts.append(pos_line)
-
-    # convert xref*
-    xref_list = sense_xml.findall('xref')
-    if xref_list:
-        xref_str_list = list()
-        for xref_xml in xref_list:
-            xref_str_list.append(xref_xml.text)
-        xref_line = '(See ' + ','.join(xref_str_list) + ')'
-        definition_text_parts.append(xref_line)
-
-    # convert ant*
-    ant_list = sense_xml.findall('ant')
-    if ant_list:
-        ant_str_list = list()
-        for ant_xml in ant_list:
-            ant_str_list.append(ant_xml.text)
-        ant_line = '(ant: ' + ','.join(ant_str_list) + ')'
-        definition_text_parts.append(ant_line)
-
-    # convert field*
-    field_list = sense_xml.findall('field')
-    if field_list:
-        field_str_list = list()
-        for field_xml in field_list:
-            field_str = str(field_xml[0])
-            field_str = field_str.translate(None, '&;')
-            field_str_list.append(field_str)
-        field_line = '{' + ','.join(field_str_list) + '}'
-        definition_text_parts.append(field_line)
-
-    # convert misc*
-    misc_list = sense_xml.findall('misc')
-    if misc_list:
-        misc_str_list = list()
-        for misc_xml in misc_list:
-            misc_str = str(misc_xml[0])
-            misc_str = misc_str.translate(None, '&;')
-            misc_str_list.append('(' + misc_str + ')')
-        misc_line = ' '.join(misc_str_list)
-        definition_text_parts.append(misc_line)
-
-    # convert s_inf*
-    s_inf_list = sense_xml.findall('s_inf')
-    if s_inf_list:
-        s_inf_str_list = list()
-        for s_inf_xml in s_inf_list:
-            s_inf_str_list.append('(' + s_inf_xml.text + ')')
-        s_inf_line = ' '.join(s_inf_str_list)
-        definition_text_parts.append(s_inf_line)
-
-    # convert lsource*
-    lsource_list = sense_xml.findall('lsource')
-    if lsource_list:
-        lsource_str_list = list()
-        for lsource_xml in lsource_list:
-            XML_NAMESPACE_PREFIX = '{http://www.w3.org/XML/1998/namespace}'
-            ls_wasei = lsource_xml.get('ls_wasei')
-            lang = lsource_xml.get(XML_NAMESPACE_PREFIX + 'lang')
-            text = lsource_xml.text
-            tmp = ''
-            if ls_wasei is not None:
-                tmp = 'wasei:'
-            elif lang is not None:
-                tmp = lang + ':'
-            else:
-                continue
-            if text is not None:
-                tmp = tmp + ' ' + text
-            lsource_str_list.append(tmp)
-        lsource_line = '(' + ', '.join(lsource_str_list) + ')'
-        definition_text_parts.append(lsource_line)
-
-    # convert dial*
-    dial_list = sense_xml.findall('dial')
-    if dial_list:
-        dial_str_list = list()
-        for dial_xml in dial_list:
-            dial_str = str(dial_xml[0])
-            dial_str = dial_str.translate(None, '&;')
-            dial_str_list.append('(' + dial_str + ')')
-        dial_line = ' '.join(dial_str_list)
-        definition_text_parts.append(dial_line)
-
-    # convert gloss*
-    gloss_list = sense_xml.findall('gloss')
-    definition_text_list = [xml.text for xml in gloss_list]
-    xml_definition_text = etree.Element('definition_text')
-    if definition_text_list:
-        definition_text_parts.append(u'; '.join(definition_text_list))
-
-    # convert example*
-    pass # not using
-
-    xml_definition_text.text = u' '.join(definition_text_parts)
-    xml_definition.append(xml_definition_text)
-
-    # convert example_list
-    for comp in example_list:
-        xml_ue = convert_example(comp)
-        xml_definition.append(xml_ue)
-    return xml_definition
-
-def test_real(jmdict_path, examples_path):
-    i = 0
-    errs = 0
-
-    ef = open('errors.txt', 'wb')
-    out = open('jmdict-importable.xml', 'wb')
-
-    jmdict_total_size = os.path.getsize(jmdict_path)
-    examples_total_size = os.path.getsize(examples_path)
-    widgets = ['Converting: ', pb.Percentage(), ' ', pb.Bar(),
-               ' ', pb.Timer(), ' ']
-    pbar = pb.ProgressBar(widgets=widgets, maxval=jmdict_total_size).start()
-
-    example_dict = load_examples(examples_path)
-
-    with open(jmdict_path, 'rb') as f:
-        with etree.xmlfile(out, encoding='utf-8') as xf:
-            xf.write_declaration()
-            context = etree.iterparse(f, tag=('entry'), resolve_entities=False)
-
-            with xf.element(NAMESPACE_PREFIX+'dictionary', nsmap=NSMAP,
-                            attrib={XSI_PREFIX+'schemaLocation': SCHEMA_LOCATION,
-                                    'schema_version': __schema_version__}): 
-                xf.write("\n")
-                xml_meta = create_meta(jmdict_path)
-                xf.write(xml_meta, pretty_print=True)
-
-                for action, elem in context:
-                    xml_entry = convert_entry(elem, example_dict)
-                    xf.write(xml_entry, pretty_print=True)
-                    pbar.update(f.tell())
-                    elem.clear()
-
-    pbar.finish()
-
-def main():
-    jmdict_path = 'JMdict_e'
-    examples_path = 'examples'
-    test_real(jmdict_path, examples_path)
-
-if __name__ == '__main__':
-    main()
-
+# -*- coding: utf-8 -*-
+from collections import defaultdict, deque
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+from lxml import etree
+from noj_converters.misc.uni_printer import UniPrinter
+from noj_converters.misc.pool import run_in_pool, worker_state
+from noj_converters.misc.entry_tree import Node
+from noj_converters.misc import sinks
+from noj_converters.misc.compressed import COMPRESSIONS, open_input, open_output, with_disk_offsets
+from noj_converters.misc.checkpoint import CHECKPOINT_INTERVAL, Checkpoint
+from noj_converters.misc.stage_timer import NullTimer, StageTimer, profiled
+from noj_converters.misc.streaming import iter_released
+from noj_converters.misc.fragments import FragmentCache, fragment_stats
+from noj_converters.misc.pipeline import PIPELINE_QUEUE_SIZE, NullPipeline, Pipeline
+from example_index import ExampleIndex, ExampleStore, iter_examples
+from entry_manifest import EntryManifest, entry_digest
+from example_join import ExampleJoin, sense_examples
+
+__version__ = '1.0.0a'
+__schema_version__ = '1.0.0a'
+
+pp = UniPrinter(indent=4)
+
+NAMESPACE_URI = "http://www.naturalorderjapanese.com"
+NAMESPACE_PREFIX = "{" + NAMESPACE_URI + "}"
+XSI = "http://www.w3.org/2001/XMLSchema-instance"
+XSI_PREFIX = "{" + XSI + "}"
+SCHEMA_LOCATION = "http://www.naturalorderjapanese.com dictionary_schema-{}.xsd".format(__schema_version__)
+NSMAP = {None:  NAMESPACE_URI,
+         'xsi': XSI}
+
+ENTRY_START = b'<entry>'
+ENTRY_END = b'</entry>'
+SPLIT_READ_SIZE = 1 << 20
+
+# The created date is in a comment in front of the first entry
+CREATED_DATE_RE = re.compile(r'<!-- JMdict created: (.*?) -->')
+
+# The entity lines convert_sense puts in front of the glosses, which
+# come from a small set of tags; each pool worker has its own. The stag,
+# xref, ant and s_inf lines are mostly unique, so they are not cached
+POS_LINES = FragmentCache('(', ',', ')')
+FIELD_LINES = FragmentCache('{', ',', '}')
+MISC_LINES = FragmentCache('(', ') (', ')')
+DIAL_LINES = FragmentCache('(', ') (', ')')
+SENSE_LINES = [POS_LINES, FIELD_LINES, MISC_LINES, DIAL_LINES]
+
+def load_examples(example_path):
+    example_dict = ExampleStore()
+    for expression, meaning, comps in iter_examples(example_path):
+        example_dict.add(expression, meaning, comps)
+    return example_dict
+
+def created_date(prolog):
+    """Return the date of the ``<!-- JMdict created: ... -->`` comment in
+    the prolog from ``iter_entry_spans``, or None."""
+    m = CREATED_DATE_RE.search(prolog)
+    if m:
+        return m.group(1)
+    return None
+
+class EntityTable(dict):
+    """Entity name (``n`` for ``&n;``) -> the text written for the
+    ``pos``, ``field``, ``misc`` and ``dial`` elements referring to it.
+    Names missing from the table are written as they are."""
+
+    def __missing__(self, name):
+        return name
+
+# Writes every entity as its name
+ENTITY_NAMES = EntityTable()
+
+def entity_table(prolog, expand=False):
+    """Build the EntityTable for the entities declared in the DTD of the
+    prolog from ``iter_entry_spans``: each maps to its name, or with
+    ``expand`` to its description (``noun (common) (futsuumeishi)``)."""
+    parser = etree.XMLParser(resolve_entities=False)
+    doc = etree.fromstring(prolog + b'</JMdict>', parser)
+    table = EntityTable()
+    dtd = doc.getroottree().docinfo.internalDTD
+    if dtd is not None:
+        for entity in dtd.iterentities():
+            table[entity.name] = entity.content if expand else entity.name
+    return table
+
+def create_meta(date):
+    """``date`` is the created date found in the file, by ``created_date``."""
+    if date is None:
+        raise Exception("Created date not found.")
+    xml_meta = Node("dictionary_meta")
+
+    # name
+    xml_name = Node('name')
+    xml_name.text = "JMDict/EDICT + Examples"
+    xml_meta.append(xml_name)
+
+    # dump_version
+    pass # no dump_version
+
+    # convert_version
+    xml_convert_version = Node('convert_version')
+    xml_convert_version.text = __version__
+    xml_meta.append(xml_convert_version)
+
+    # date
+    xml_date = Node('date')
+    xml_date.text = date
+    xml_meta.append(xml_date)
+
+    # extra
+    pass # no extra
+
+    return xml_meta
+    
+
+def convert_entry(entry_xml, example_dict, example_join=None, entities=ENTITY_NAMES):
+    xml_entry = Node("entry", format="J-E1")
+    # print etree.tostring(entry_xml, pretty_print=True, encoding='utf-8')
+
+    # convert "ent_seq"
+    # MAYBE incorporate later
+    # ent_seq_xml = entry_xml.find('ent_seq')
+    # xml_entry.set('orig_id', ent_seq_xml.text)
+
+    # convert "r_ele+"
+    kana_set = set()
+    r_ele_list = entry_xml.findall('r_ele')
+    for r_ele_xml in r_ele_list:
+        # convert reb
+        reb_xml = r_ele_xml.find('reb')
+        xml_kana = Node("kana")
+        xml_kana.text = reb_xml.text
+
+        # convert re_nokanji
+        re_nokanji = r_ele_xml.find('re_nokanji')
+        if re_nokanji is not None:
+            continue
+
+        # TODO: handle this properly
+
+        # convert re_restr*
+        pass
+        # convert re_inf*
+        pass
+        # convert re_pri*
+        pass
+
+        kana_set.add(reb_xml.text)
+        xml_entry.append(xml_kana)
+
+    # convert "k_ele*"
+    kanji_set = set()
+    k_ele_list = entry_xml.findall('k_ele')
+    for k_ele_xml in k_ele_list:
+        # convert keb
+        keb_xml = k_ele_xml.find('keb')
+        xml_kanji = Node("kanji")
+        xml_kanji.text = keb_xml.text
+
+        # TODO: handle this properly
+
+        # convert ke_inf*
+        pass
+        # convert ke_pri*
+        pass
+
+        kanji_set.add(keb_xml.text)
+        xml_entry.append(xml_kanji)
+
+    sense_list = entry_xml.findall('sense')
+
+    # Find candidate example sentences
+    if example_join is not None:
+        entry_examples, examples_by_sense = example_join.get(entry_xml.findtext('ent_seq'),
+                                                             len(sense_list))
+    else:
+        defnum_to_examples = defaultdict(list)
+        key_set = kana_set if len(kanji_set) == 0 else kanji_set
+        for key in key_set:
+            # A single lookup, which is a query when example_dict is an
+            # ExampleIndex
+            for comp in example_dict.get(key, ()):
+                if 'reading' in comp and comp['reading'] not in kana_set:
+                    continue
+                if 'defnum' in comp:
+                    defnum_to_examples[comp['defnum']].append(comp)
+                else:
+                    defnum_to_examples[None].append(comp)
+        entry_examples, examples_by_sense = sense_examples(defnum_to_examples, len(sense_list))
+
+    # convert "info?"
+    pass # not using
+
+    # convert "sense+"
+    append_to = xml_entry
+    if len(sense_list) > 1:
+        append_to = Node('definition', group="multidefinition")
+        for comp in entry_examples:
+            xml_ue = convert_example(comp)
+            append_to.append(xml_ue)
+        xml_entry.append(append_to)
+
+    for sense_xml, examples_for_defnum in zip(sense_list, examples_by_sense):
+        xml_definition = convert_sense(sense_xml, examples_for_defnum, entities)
+        append_to.append(xml_definition)
+
+    return xml_entry
+
+def convert_entry_cached(entry_xml, example_dict, manifest, example_join=None,
+                         entities=ENTITY_NAMES):
+    """``convert_entry``, reusing the manifest's earlier conversion when
+    neither the entry nor its examples changed."""
+    ent_seq = int(entry_xml.findtext('ent_seq'))
+    digest = entry_digest(entry_xml, example_dict)
+    xml_entry = manifest.get(ent_seq, digest)
+    if xml_entry is None:
+        xml_entry = convert_entry(entry_xml, example_dict, example_join, entities)
+        manifest.put(ent_seq, digest, xml_entry)
+    return xml_entry
+
+def convert_example(comp):
+    xml_ue = Node('usage_example', type="SENTENCE")
+
+    xml_expression = Node('expression')
+    xml_expression.text = comp['expression']
+    xml_ue.append(xml_expression)
+
+    xml_meaning = Node('meaning')
+    xml_meaning.text = comp['meaning']
+    xml_ue.append(xml_meaning)
+
+    if 'validated' not in comp:
+        xml_ue.set('validated', 'false')
+    return xml_ue
+
+def convert_sense(sense_xml, example_list, entities=ENTITY_NAMES):
+    definition_text_parts = list()
+    xml_definition = Node('definition')
+
+    stag_str_list = list()
+
+    # convert stagk*
+    stagk_list = sense_xml.findall('stagk')
+    if stagk_list:
+        stagk_str_list = list()
+        for stagk_xml in stagk_list:
+            stag_str_list.append(stagk_xml.text)
+
+    # convert stagr*
+    stagr_list = sense_xml.findall('stagr')
+    if stagr_list:
+        stagr_str_list = list()
+        for stagr_xml in stagr_list:
+            stag_str_list.append(stagr_xml.text)
+
+    if stag_str_list:
+        stag_line = '(' + ', '.join(stag_str_list) + ' only)'
+        definition_text_parts.append(stag_line)
+
+    # convert pos*
+    pos_list = sense_xml.findall('pos')
+    if pos_list:
+        pos_str_list = list()
+        for pos_xml in pos_list:
+            pos_str = entities[pos_xml[0].name]
+            pos_str_list.append(pos_str)
+        pos_line = POS_LINES.join(pos_str_list)
+        definition_text_parts.append(pos_line)
+
+    # convert xref*
+    xref_list = sense_xml.findall('xref')
+    if xref_list:
+        xref_str_list = list()
+        for xref_xml in xref_list:
+            xref_str_list.append(xref_xml.text)
+        xref_line = '(See ' + ','.join(xref_str_list) + ')'
+        definition_text_parts.append(xref_line)
+
+    # convert ant*
+    ant_list = sense_xml.findall('ant')
+    if ant_list:
+        ant_str_list = list()
+        for ant_xml in ant_list:
+            ant_str_list.append(ant_xml.text)
+        ant_line = '(ant: ' + ','.join(ant_str_list) + ')'
+        definition_text_parts.append(ant_line)
+
+    # convert field*
+    field_list = sense_xml.findall('field')
+    if field_list:
+        field_str_list = list()
+        for field_xml in field_list:
+            field_str = entities[field_xml[0].name]
+            field_str_list.append(field_str)
+        field_line = FIELD_LINES.join(field_str_list)
+        definition_text_parts.append(field_line)
+
+    # convert misc*
+    misc_list = sense_xml.findall('misc')
+    if misc_list:
+        misc_str_list = list()
+        for misc_xml in misc_list:
+            misc_str = entities[misc_xml[0].name]
+            misc_str_list.append(misc_str)
+        misc_line = MISC_LINES.join(misc_str_list)
+        definition_text_parts.append(misc_line)
+
+    # convert s_inf*
+    s_inf_list = sense_xml.findall('s_inf')
+    if s_inf_list:
+        s_inf_str_list = list()
+        for s_inf_xml in s_inf_list:
+            s_inf_str_list.append('(' + s_inf_xml.text + ')')
+        s_inf_line = ' '.join(s_inf_str_list)
+        definition_text_parts.append(s_inf_line)
+
+    # convert lsource*
+    lsource_list = sense_xml.findall('lsource')
+    if lsource_list:
+        lsource_str_list = list()
+        for lsource_xml in lsource_list:
+            XML_NAMESPACE_PREFIX = '{http://www.w3.org/XML/1998/namespace}'
+            ls_wasei = lsource_xml.get('ls_wasei')
+            lang = lsource_xml.get(XML_NAMESPACE_PREFIX + 'lang')
+            text = lsource_xml.text
+            tmp = ''
+            if ls_wasei is not None:
+                tmp = 'wasei:'
+            elif lang is not None:
+                tmp = lang + ':'
+            else:
+                continue
+            if text is not None:
+                tmp = tmp + ' ' + text
+            lsource_str_list.append(tmp)
+        lsource_line = '(' + ', '.join(lsource_str_list) + ')'
+        definition_text_parts.append(lsource_line)
+
+    # convert dial*
+    dial_list = sense_xml.findall('dial')
+    if dial_list:
+        dial_str_list = list()
+        for dial_xml in dial_list:
+            dial_str = entities[dial_xml[0].name]
+            dial_str_list.append(dial_str)
+        dial_line = DIAL_LINES.join(dial_str_list)
+        definition_text_parts.append(dial_line)
+
+    # convert gloss*
+    gloss_list = sense_xml.findall('gloss')
+    definition_text_list = [xml.text for xml in gloss_list]
+    xml_definition_text = Node('definition_text')
+    if definition_text_list:
+        definition_text_parts.append(u'; '.join(definition_text_list))
+
+    # convert example*
+    pass # not using
+
+    xml_definition_text.text = u' '.join(definition_text_parts)
+    xml_definition.append(xml_definition_text)
+
+    # convert example_list
+    for comp in example_list:
+        xml_ue = convert_example(comp)
+        xml_definition.append(xml_ue)
+    return xml_definition
+
+def iter_entry_spans(f, read_size=SPLIT_READ_SIZE, offset=None):
+    """Split a JMdict file into raw ``<entry>`` byte spans without parsing.
+
+    The first item yielded is the prolog, i.e. everything in front of the
+    first entry including the DTD and the opening ``<JMdict>`` tag. After
+    that ``(span, offset)`` pairs follow, where ``offset`` is the byte
+    position just past the span. Given one of those offsets as
+    ``offset``, the spans carry on from there after the prolog.
+    """
+    buf = b''
+    buf_offset = 0
+    prolog = None
+    while True:
+        chunk = f.read(read_size)
+        buf += chunk
+        pos = 0
+        if prolog is None:
+            start = buf.find(ENTRY_START)
+            if start == -1:
+                if not chunk:
+                    yield buf
+                    return
+                continue
+            prolog = buf[:start]
+            yield prolog
+            pos = start
+            if offset is not None:
+                f.seek(offset)
+                buf = b''
+                buf_offset = offset
+                continue
+        while True:
+            start = buf.find(ENTRY_START, pos)
+            if start == -1:
+                break
+            end = buf.find(ENTRY_END, start)
+            if end == -1:
+                break
+            end += len(ENTRY_END)
+            yield buf[start:end], buf_offset + end
+            pos = end
+        buf = buf[pos:]
+        buf_offset += pos
+        if not chunk:
+            return
+
+def iter_parsed_entries(prolog, spans):
+    """Parse the ``<entry>`` spans from ``iter_entry_spans`` one by one.
+
+    Yields ``(entry_xml, pos)`` pairs. Unlike ``iterparse`` on the file,
+    which reads ahead, this knows the position just past each entry.
+    Each entry is released (see ``streaming.release``) when the next one
+    is asked for, so memory stays flat however many entries there are.
+    """
+    parser = etree.XMLPullParser(events=('end',), tag='entry', resolve_entities=False)
+    parser.feed(prolog)
+    positions = deque()
+    for span, pos in spans:
+        positions.append(pos)
+        parser.feed(span)
+        for action, elem in iter_released(parser.read_events()):
+            yield elem, positions.popleft()
+
+def test_real(jmdict_path, examples_path, workers=1, example_index_path=None, timer=None,
+              manifest_path=None, pre_join=False, join_report_path=None, output_format='xml',
+              pretty_print=True, compress=None, checkpoint_interval=CHECKPOINT_INTERVAL,
+              resume=False, shards=None, expand_entities=False, pipeline=None):
+    i = 0
+    errs = 0
+    timer = timer or NullTimer()
+    pipeline = pipeline or NullPipeline()
+    manifest = None
+
+    out_path = 'jmdict-importable' + sinks.EXTENSIONS[output_format]
+    if compress is not None:
+        out_path += '.' + compress
+    checkpoint = Checkpoint(out_path, jmdict_path, checkpoint_interval,
+                            {'format': output_format, 'pretty_print': pretty_print,
+                             'shards': shards and list(shards),
+                             'expand_entities': expand_entities})
+    state = checkpoint.load() if resume else None
+    resume_at = input_offset = error_offset = None
+    if state is not None:
+        resume_at = state['output_offset']
+        input_offset = state['input_offset']
+        error_offset = state['error_offset']
+
+    # Progress is measured in bytes of the file on disk, compressed or not
+    jmdict_total_size = os.path.getsize(jmdict_path)
+    import progressbar as pb
+    widgets = ['Converting: ', pb.Percentage(), ' ', pb.Bar(),
+               ' ', pb.Timer(), ' ']
+    pbar = pb.ProgressBar(widgets=widgets, maxval=jmdict_total_size).start()
+
+    with timer.stage('load_examples', per_entry=False):
+        example_dict = None
+        if example_index_path is not None:
+            try:
+                example_dict = ExampleIndex(examples_path, example_index_path)
+            except (sqlite3.Error, OSError) as e:
+                print >> sys.stderr, "Loading the examples into memory, {} can't be " \
+                                     "opened: {}".format(example_index_path, e)
+        if example_dict is None:
+            example_dict = load_examples(examples_path)
+
+    example_join = None
+    if pre_join or join_report_path is not None:
+        with timer.stage('pre_join', per_entry=False):
+            example_join = ExampleJoin(jmdict_path, example_dict)
+        if join_report_path is not None:
+            example_join.write_report(join_report_path)
+
+    with open_output('errors.txt', error_offset) as ef, open_input(jmdict_path) as f:
+        with sinks.open_sink(output_format, out_path, NAMESPACE_PREFIX+'dictionary',
+                             {XSI_PREFIX+'schemaLocation': SCHEMA_LOCATION,
+                              'schema_version': __schema_version__}, NSMAP,
+                             pretty_print, resume_at, shards) as sink:
+            # The created date is in the prolog, so the file is only read
+            # once. When resuming, the spans carry on from the checkpoint
+            spans = iter_entry_spans(f, offset=input_offset)
+            prolog = next(spans)
+            if state is None:
+                sink.write_meta(create_meta(created_date(prolog)))
+            entities = entity_table(prolog, expand_entities)
+            if manifest_path is not None:
+                converter_version = __version__
+                if expand_entities:
+                    # The descriptions come from the DTD, not the entries
+                    converter_version += '/' + hashlib.sha1(
+                        repr(sorted(entities.items()))).hexdigest()
+                manifest = EntryManifest(manifest_path, converter_version)
+
+            # With a Pipeline the spans are read and split in a thread of
+            # their own, and the sink is written in another. Each position
+            # is paired with the one on disk for the progress bar
+            spans = pipeline.read_ahead(with_disk_offsets(f, spans), 'read')
+
+            def write(converted):
+                xml_entry, (pos, disk_pos) = converted
+                with timer.stage('serialize'):
+                    sink.write(xml_entry)
+                timer.end_entry(xml_entry)
+                if checkpoint.due():
+                    ef.flush()
+                    checkpoint.save(sink, pos, error_offset=ef.tell())
+                pbar.update(disk_pos)
+
+            with pipeline.write_behind(write, 'write') as writer:
+                if workers <= 1:
+                    entries = iter_parsed_entries(prolog, spans)
+                    for elem, pos in timer.iterate('parse', entries):
+                        with timer.stage('transform'):
+                            if manifest is None:
+                                xml_entry = convert_entry(elem, example_dict, example_join,
+                                                          entities)
+                            else:
+                                xml_entry = convert_entry_cached(elem, example_dict, manifest,
+                                                                 example_join, entities)
+                        writer.put((xml_entry, pos))
+                else:
+                    for xml_entry, pos in convert_parallel(prolog, spans, example_dict,
+                                                           workers, example_join, entities):
+                        writer.put((xml_entry, pos))
+    checkpoint.finish()
+
+    pbar.finish()
+    if manifest is not None:
+        stats = manifest.finish()
+        print "{unchanged} unchanged, {changed} changed, {added} added, {removed} removed".format(**stats)
+    if workers <= 1:
+        timer.count('fragment_cache', *fragment_stats(SENSE_LINES))
+    for stats in pipeline.queues:
+        print stats
+
+def convert_parallel(prolog, spans, example_dict, workers, example_join=None,
+                     entities=ENTITY_NAMES):
+    """Convert the entries of a JMdict file in a process pool.
+
+    ``prolog`` and ``spans`` come from ``iter_entry_spans``. The raw
+    ``<entry>`` spans are streamed to the workers, which parse them
+    against the file's own prolog (so entity references stay intact) and
+    return the converted entries in batches. Yields ``(xml_entry, pos)``
+    pairs in file order.
+    """
+    state = (prolog, example_dict, example_join, entities)
+    for chunk in run_in_pool(_pool_convert_chunk, spans, workers, state):
+        for entry_tuple, pos in chunk:
+            yield Node.from_tuple(entry_tuple), pos
+
+def _pool_convert_chunk(chunk):
+    """Convert a chunk of spans in a pool worker of ``convert_parallel``."""
+    prolog, example_dict, example_join, entities = worker_state()
+    spans = [span for span, pos in chunk]
+    parser = etree.XMLParser(resolve_entities=False, huge_tree=True)
+    doc = etree.fromstring(prolog + b''.join(spans) + b'</JMdict>', parser)
+    results = list()
+    for entry_xml, (span, pos) in zip(doc.iterfind('entry'), chunk):
+        xml_entry = convert_entry(entry_xml, example_dict, example_join, entities)
+        results.append((xml_entry.to_tuple(), pos))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert JMdict and the Tanaka examples to NOJ XML.")
+    parser.add_argument('jmdict_path', nargs='?', default='JMdict_e')
+    parser.add_argument('examples_path', nargs='?', default='examples')
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of converter processes (default: 1)")
+    parser.add_argument('--example-index', nargs='?', const='', metavar='PATH',
+                        help="look the examples up in an on-disk index in PATH instead of "
+                             "loading them into memory (default: EXAMPLES_NAME.sqlite in "
+                             "the working directory)")
+    parser.add_argument('--timing-report', metavar='PATH',
+                        help="write per-stage times, entry latencies, the slowest entries "
+                             "and cache hits to PATH as JSON (requires --workers 1)")
+    parser.add_argument('--slowest', type=int, default=10, metavar='N',
+                        help="number of slowest entries in the timing report (default: 10)")
+    parser.add_argument('--cprofile', metavar='PATH',
+                        help="run under cProfile and dump the stats to PATH")
+    parser.add_argument('--incremental', metavar='MANIFEST', nargs='?',
+                        const='jmdict-importable.xml.manifest',
+                        help="only reconvert entries that changed since the last run, "
+                             "keeping conversions in MANIFEST "
+                             "(default: jmdict-importable.xml.manifest; requires --workers 1)")
+    parser.add_argument('--format', choices=sinks.FORMATS, default='xml',
+                        help="output format (default: xml)")
+    parser.add_argument('--compact', action='store_true',
+                        help="write the XML without line breaks and indentation")
+    parser.add_argument('--compress', choices=COMPRESSIONS,
+                        help="compress the output (not with --format sqlite)")
+    parser.add_argument('--shard', type=sinks.parse_shard_split, metavar='SPLIT:N',
+                        help="split the output into complete documents of N entries "
+                             "(entries:N), of about N bytes (size:N, K/M/G allowed) or "
+                             "into N shards by kana (kana:N), listed in a .shards.json file")
+    parser.add_argument('--pre-join', action='store_true',
+                        help="assign examples to all entries in one pass before converting")
+    parser.add_argument('--join-report', metavar='PATH',
+                        help="write unmatched and ambiguous example components to PATH "
+                             "(implies --pre-join)")
+    parser.add_argument('--expand-entities', action='store_true',
+                        help="write part of speech, field, misc and dialect entities as "
+                             "their descriptions from the DTD instead of their names")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="read and write in threads of their own, overlapping them "
+                             "with the conversion, and print queue depths and stall times")
+    parser.add_argument('--pipeline-queue', type=int, default=PIPELINE_QUEUE_SIZE, metavar='N',
+                        help="batches held between two pipeline stages "
+                             "(default: {})".format(PIPELINE_QUEUE_SIZE))
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_INTERVAL, metavar='N',
+                        help="save a checkpoint every N entries, 0 for none "
+                             "(default: {})".format(CHECKPOINT_INTERVAL))
+    parser.add_argument('--resume', action='store_true',
+                        help="carry on from the last checkpoint of an interrupted run")
+    args = parser.parse_args()
+    if args.timing_report and args.workers > 1:
+        parser.error("--timing-report requires --workers 1")
+    if args.incremental and args.workers > 1:
+        parser.error("--incremental requires --workers 1")
+    if args.timing_report and args.pipeline:
+        parser.error("--timing-report cannot be used with --pipeline")
+    if args.compress and args.format == 'sqlite':
+        parser.error("--compress cannot be used with --format sqlite")
+    if args.resume and args.compress:
+        parser.error("--resume cannot be used with --compress")
+    if args.resume and args.incremental:
+        parser.error("--resume cannot be used with --incremental")
+    example_index_path = None
+    if args.example_index is not None:
+        # Like the output, in the working directory rather than next to the examples
+        example_index_path = (args.example_index or
+                              os.path.basename(args.examples_path) + '.sqlite')
+    timer = StageTimer(args.slowest) if args.timing_report else None
+    pipeline = Pipeline(args.pipeline_queue) if args.pipeline else None
+    with profiled(args.cprofile):
+        test_real(args.jmdict_path, args.examples_path, workers=args.workers,
+                  example_index_path=example_index_path, timer=timer,
+                  manifest_path=args.incremental, pre_join=args.pre_join,
+                  join_report_path=args.join_report, output_format=args.format,
+                  pretty_print=not args.compact, compress=args.compress,
+                  checkpoint_interval=args.checkpoint_every, resume=args.resume,
+                  shards=args.shard, expand_entities=args.expand_entities,
+                  pipeline=pipeline)
+    if timer is not None:
+        timer.write_report(args.timing_report)
+
+if __name__ == '__main__':
+    main()
+
@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+from textwrap import dedent
+from lxml import etree
+from noj_converters.misc import pool, sinks
+from noj_converters.jmdict import jmdict_converter
+from noj_converters.jmdict.example_index import ExampleIndex, ExampleStore
+from noj_converters.jmdict.example_join import ExampleJoin
+
+JMDICT = dedent(u"""\
+    <?xml version="1.0" encoding="UTF-8"?>
+    <!DOCTYPE JMdict [
+    <!ENTITY n "noun (common) (futsuumeishi)">
+    <!ENTITY uk "word usually written using kana alone">
+    <!ENTITY adj-na "adjectival nouns or quasi-adjectives (keiyodoshi)">
+    <!ENTITY int "interjection (kandoushi)">
+    <!ENTITY food "food term">
+    ]>
+    <!-- JMdict created: 2014-07-01 -->
+    <JMdict>
+    <entry>
+    <ent_seq>1000000</ent_seq>
+    <k_ele><keb>明白</keb></k_ele>
+    <r_ele><reb>めいはく</reb></r_ele>
+    <r_ele><reb>メイハク</reb><re_nokanji/></r_ele>
+    <sense><pos>&adj-na;</pos><pos>&n;</pos><gloss>obvious</gloss><gloss>clear &amp; plain</gloss></sense>
+    <sense><lsource xml:lang="ger">Arbeit</lsource><gloss>a &lt;test&gt;</gloss></sense>
+    </entry>
+    <entry>
+    <ent_seq>1000010</ent_seq>
+    <r_ele><reb>ああ</reb></r_ele>
+    <sense><pos>&int;</pos><misc>&uk;</misc><gloss>ah!</gloss></sense>
+    </entry>
+    <entry>
+    <ent_seq>1000020</ent_seq>
+    <k_ele><keb>生</keb></k_ele>
+    <r_ele><reb>なま</reb></r_ele>
+    <r_ele><reb>ナマ</reb></r_ele>
+    <sense><pos>&n;</pos><field>&food;</field><gloss>raw</gloss></sense>
+    <sense><gloss>live (not recorded)</gloss></sense>
+    <sense><stagr>ナマ</stagr><gloss>draft beer</gloss></sense>
+    </entry>
+    <entry>
+    <ent_seq>1000030</ent_seq>
+    <k_ele><keb>生</keb></k_ele>
+    <r_ele><reb>き</reb></r_ele>
+    <sense><pos>&n;</pos><gloss>pure</gloss><gloss>undiluted</gloss></sense>
+    </entry>
+    <entry>
+    <ent_seq>1000040</ent_seq>
+    <k_ele><keb>犬</keb></k_ele>
+    <k_ele><keb>狗</keb></k_ele>
+    <r_ele><reb>いぬ</reb></r_ele>
+    <sense><pos>&n;</pos><gloss>dog</gloss></sense>
+    <sense><xref>回し者</xref><gloss>snoop</gloss></sense>
+    </entry>
+    <entry>
+    <ent_seq>1000050</ent_seq>
+    <k_ele><keb>猫</keb></k_ele>
+    <r_ele><reb>ねこ</reb></r_ele>
+    <sense><pos>&n;</pos><gloss>cat</gloss></sense>
+    </entry>
+    <entry>
+    <ent_seq>1000060</ent_seq>
+    <r_ele><reb>まあ</reb></r_ele>
+    <sense><pos>&int;</pos><gloss>well</gloss></sense>
+    </entry>
+    </JMdict>
+    """).encode('utf-8')
+
+# Tanaka Corpus lines for JMDICT, keeping only the components of
+# interest. 生 is shared by two entries and only one of them has the
+# reading なま, 1000030 has no second sense for 生[02], 犬[05] points
+# past the last sense of 1000040 and 鳥 has no entry at all. 1000040 is
+# found under both 犬 and 狗.
+EXAMPLES = dedent(u"""\
+    A: 明白だ。\tIt is obvious.#ID=1_2
+    B: 明白[01]
+    A: 明白な事実。\tAn obvious fact.#ID=3_4
+    B: 明白 事実
+    A: ああ、そうか。\tAh, I see.#ID=5_6
+    B: ああ
+    A: 生が好きだ。\tI like it raw.#ID=7_8
+    B: 生(なま)[01]~ 好き
+    A: 生の声を聞いた。\tI heard a live voice.#ID=9_10
+    B: 生[02] 聞く{聞いた}
+    A: 生で飲む。\tI drink it straight.#ID=11_12
+    B: 生 飲む
+    A: 生きる。\tTo live.#ID=13_14
+    B: 生(しょう)
+    A: 犬がいる。\tThere is a dog.#ID=15_16
+    B: 犬[05] 居る{いる}
+    A: 犬と猫と鳥。\tA dog, a cat and a bird.#ID=17_18
+    B: 犬[02] 猫 鳥
+    A: 狗が吠える。\tThe dog barks.#ID=19_20
+    B: 狗 吠える
+    A: 犬を飼う。\tI keep a dog.#ID=21_22
+    B: 犬 飼う
+    """).encode('euc-jp')
+
+# Streams COUNT generated entries through iter_parsed_entries and prints
+# the peak RSS
+STREAMING_SCRIPT = dedent("""\
+    import resource, sys
+    from noj_converters.jmdict.jmdict_converter import iter_parsed_entries
+    count = int(sys.argv[1])
+    spans = ((b'<entry><ent_seq>%d</ent_seq><r_ele><reb>reading</reb></r_ele>'
+              b'<sense><gloss>meaning of entry %d</gloss></sense></entry>\\n' % (i, i), i)
+             for i in xrange(count))
+    for elem, pos in iter_parsed_entries(b'<JMdict>\\n', spans):
+        assert elem.getparent().index(elem) <= 1
+    print resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    """)
+
+# For the PYTHONPATH of STREAMING_SCRIPT; the tests run in a temporary
+# directory
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class CountingIndex(ExampleIndex):
+    built = False
+
+    def build(self):
+        self.built = True
+        super(CountingIndex, self).build()
+
+class Interrupted(Exception):
+    pass
+
+def interrupt_after(count):
+    """Make XmlSink.write raise Interrupted once ``count`` entries are
+    written; call the function returned to undo it."""
+    write = sinks.XmlSink.__dict__['write']
+    written = [0]
+    def interrupted_write(sink, entry):
+        if written[0] == count:
+            raise Interrupted()
+        written[0] += 1
+        write(sink, entry)
+    sinks.XmlSink.write = interrupted_write
+    return lambda: setattr(sinks.XmlSink, 'write', write)
+
+class TestJMdict(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='noj_test')
+        # test_real writes to the working directory
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        self.write('JMdict_e', JMDICT)
+        self.write('examples', EXAMPLES)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, data):
+        with open(name, 'wb') as f:
+            f.write(data)
+
+    def convert(self, **kwargs):
+        """Convert JMdict_e with examples and return the output."""
+        jmdict_converter.test_real('JMdict_e', 'examples', **kwargs)
+        with open('jmdict-importable.xml', 'rb') as f:
+            return f.read()
+
+    def convert_incremental(self, **kwargs):
+        """Convert with an entry manifest and return the output and the
+        (unchanged, changed, added, removed) counts printed."""
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            output = self.convert(manifest_path='manifest.sqlite', **kwargs)
+            printed = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        m = re.search(r'(\d+) unchanged, (\d+) changed, (\d+) added, (\d+) removed', printed)
+        return output, tuple(int(count) for count in m.groups())
+
+    def test_to_xml(self):
+        example_dict = jmdict_converter.load_examples('examples')
+        entries = list()
+        for action, elem in etree.iterparse('JMdict_e', tag='entry', resolve_entities=False):
+            entries.append(jmdict_converter.convert_entry(elem, example_dict))
+        self.assertEqual(len(entries), 7)
+        for xml_entry in entries:
+            for pretty_print in (True, False):
+                expected = etree.tostring(xml_entry.to_element(), encoding='utf-8',
+                                          pretty_print=pretty_print)
+                self.assertEqual(xml_entry.to_xml(pretty_print), expected.rstrip(b'\n'))
+
+    def test_entity_table(self):
+        prolog = JMDICT[:JMDICT.index(b'<entry>')]
+        names = jmdict_converter.entity_table(prolog)
+        descriptions = jmdict_converter.entity_table(prolog, expand=True)
+        self.assertEqual(names, {'n': 'n', 'uk': 'uk', 'adj-na': 'adj-na', 'int': 'int',
+                                 'food': 'food'})
+        self.assertEqual(descriptions['n'], 'noun (common) (futsuumeishi)')
+        self.assertEqual(descriptions['vs-i'], 'vs-i')
+        entry_xml = etree.fromstring(JMDICT, etree.XMLParser(resolve_entities=False))[1]
+        for entities, text in ((names, b'(int) (uk)'),
+                               (descriptions, b'(interjection (kandoushi)) '
+                                              b'(word usually written using kana alone)')):
+            entry = jmdict_converter.convert_entry(entry_xml, ExampleStore(), entities=entities)
+            self.assertIn(text, etree.tostring(entry.to_element(), encoding='utf-8'))
+
+    def test_created_date(self):
+        prolog = JMDICT[:JMDICT.index(b'<entry>')]
+        date = jmdict_converter.created_date(prolog)
+        self.assertEqual(date, '2014-07-01')
+        meta = jmdict_converter.create_meta(date)
+        self.assertEqual([(child.tag, child.text) for child in meta.children],
+                         [('name', 'JMDict/EDICT + Examples'),
+                          ('convert_version', jmdict_converter.__version__),
+                          ('date', '2014-07-01')])
+        self.assertIn(b'<date>2014-07-01</date>', self.convert())
+        # Without the comment
+        comment = b'<!-- JMdict created: 2014-07-01 -->\n'
+        self.assertIsNone(jmdict_converter.created_date(prolog.replace(comment, b'')))
+        with self.assertRaisesRegexp(Exception, 'Created date not found'):
+            jmdict_converter.create_meta(None)
+        self.write('JMdict_e', JMDICT.replace(comment, b''))
+        with self.assertRaisesRegexp(Exception, 'Created date not found'):
+            self.convert()
+
+    def test_workers(self):
+        output = self.convert()
+        self.assertEqual(output.count(b'<entry '), 7)
+        self.assertEqual(output.count(b'<usage_example '), 11)
+        # Two entries per chunk, so the pool has several chunks in flight
+        chunk_size = pool.POOL_CHUNK_SIZE
+        pool.POOL_CHUNK_SIZE = 2
+        try:
+            self.assertEqual(self.convert(workers=2), output)
+        finally:
+            pool.POOL_CHUNK_SIZE = chunk_size
+
+    def test_resume(self):
+        expected = self.convert()
+        with open('errors.txt', 'rb') as f:
+            expected_errors = f.read()
+        # Stopped after the fifth entry, so the checkpoint after the fourth
+        # is where the next run carries on
+        undo = interrupt_after(5)
+        try:
+            with self.assertRaises(Interrupted):
+                self.convert(checkpoint_interval=2)
+        finally:
+            undo()
+        self.assertTrue(os.path.exists('jmdict-importable.xml.checkpoint'))
+        # The interrupted output is left unfinished
+        with open('jmdict-importable.xml', 'rb') as f:
+            self.assertFalse(f.read().rstrip().endswith(b'</dictionary>'))
+        with self.assertRaisesRegexp(Exception, 'different options'):
+            self.convert(checkpoint_interval=2, resume=True, expand_entities=True)
+        self.write('JMdict_e', JMDICT + b'\n')
+        with self.assertRaisesRegexp(Exception, 'changed since'):
+            self.convert(checkpoint_interval=2, resume=True)
+        self.write('JMdict_e', JMDICT)
+        self.assertEqual(self.convert(checkpoint_interval=2, resume=True), expected)
+        with open('errors.txt', 'rb') as f:
+            self.assertEqual(f.read(), expected_errors)
+        self.assertFalse(os.path.exists('jmdict-importable.xml.checkpoint'))
+
+    def test_example_index(self):
+        store = jmdict_converter.load_examples('examples')
+        index = CountingIndex('examples')
+        self.assertTrue(index.built)
+        self.assertEqual(len(list(index.iteritems())), len(store))
+        for key, comps in store.iteritems():
+            self.assertEqual([(c.sentence, c.reading, c.defnum, c.conj, c.validated)
+                              for c in index[key]],
+                             [(c.sentence, c.reading, c.defnum, c.conj, c.validated)
+                              for c in comps])
+        self.assertEqual(index.get(u'鳥')[0]['meaning'], u'A dog, a cat and a bird.')
+        self.assertIsNone(index.get(u'象'))
+        index.close()
+
+        # Same size and mtime
+        index = CountingIndex('examples')
+        self.assertFalse(index.built)
+        index.close()
+
+        # Touched, but the content and so the hash are the same
+        st = os.stat('examples')
+        os.utime('examples', (st.st_atime, st.st_mtime + 10))
+        index = CountingIndex('examples')
+        self.assertFalse(index.built)
+        self.assertEqual(index.read_meta()['mtime'], index.source_stat()[1])
+        index.close()
+
+        # Edited in place, keeping the size
+        self.write('examples', EXAMPLES.replace(b'A dog, a cat', b'A cat, a dog'))
+        os.utime('examples', (st.st_atime, st.st_mtime + 20))
+        index = CountingIndex('examples')
+        self.assertTrue(index.built)
+        self.assertEqual(index[u'鳥'][0]['meaning'], u'A cat, a dog and a bird.')
+        index.close()
+
+    def test_incremental(self):
+        self.assertEqual(self.convert_incremental(), (self.convert(), (0, 0, 7, 0)))
+        self.assertEqual(self.convert_incremental(), (self.convert(), (7, 0, 0, 0)))
+
+        # A gloss of 1000020 and an example of 1000000 change, 1000060 is
+        # removed and 1000070 takes the example for 鳥
+        new_entry = (u'<entry>\n<ent_seq>1000070</ent_seq>\n<k_ele><keb>鳥</keb></k_ele>\n'
+                     u'<r_ele><reb>とり</reb></r_ele>\n<sense><gloss>bird</gloss></sense>\n'
+                     u'</entry>\n').encode('utf-8')
+        jmdict = JMDICT.replace(b'<gloss>raw</gloss>', b'<gloss>uncooked</gloss>')
+        start = jmdict.index(b'<entry>\n<ent_seq>1000060')
+        end = jmdict.index(b'</JMdict>')
+        self.write('JMdict_e', jmdict[:start] + new_entry + jmdict[end:])
+        self.write('examples', EXAMPLES.replace(b'An obvious fact.', b'A plain fact.'))
+        output, counts = self.convert_incremental()
+        self.assertEqual(counts, (4, 2, 1, 1))
+        self.assertIn(b'uncooked', output)
+        self.assertIn(b'A plain fact.', output)
+        self.assertEqual(output, self.convert())
+
+        # The descriptions of the entities are not part of the digests, so
+        # switching to them starts the manifest over
+        output, counts = self.convert_incremental(expand_entities=True)
+        self.assertEqual(counts, (0, 0, 7, 0))
+        self.assertIn(b'{food term}', output)
+        self.assertEqual(output, self.convert(expand_entities=True))
+        self.assertEqual(self.convert_incremental(expand_entities=True)[1], (7, 0, 0, 0))
+        self.assertEqual(self.convert_incremental()[1], (0, 0, 7, 0))
+
+    def test_example_index_fallback(self):
+        expected = self.convert()
+        self.assertEqual(self.convert(example_index_path='examples.sqlite'), expected)
+        self.assertTrue(os.path.exists('examples.sqlite'))
+        # An index that can't be written loads the examples into memory
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            output = self.convert(example_index_path=os.path.join('missing', 'examples.sqlite'))
+            printed = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertEqual(output, expected)
+        self.assertIn("can't be opened", printed)
+
+    def test_example_join(self):
+        for example_dict in (jmdict_converter.load_examples('examples'), ExampleIndex('examples')):
+            join = ExampleJoin('JMdict_e', example_dict)
+            examples = 0
+            for action, elem in etree.iterparse('JMdict_e', tag='entry', resolve_entities=False):
+                expected = jmdict_converter.convert_entry(elem, example_dict).to_xml()
+                joined = jmdict_converter.convert_entry(elem, example_dict, example_join=join)
+                self.assertEqual(joined.to_xml(), expected)
+                examples += expected.count(b'<usage_example ')
+            self.assertEqual(examples, 11)
+
+            join.write_report('report.txt')
+            with open('report.txt', 'rb') as f:
+                report = f.read().decode('utf-8')
+            unmatched, ambiguous = report.split(u'# ambiguous: ')
+            unmatched = unmatched.splitlines()
+            ambiguous = ambiguous.splitlines()
+            self.assertEqual(unmatched[0], u'# unmatched: 11')
+            self.assertEqual(sorted(unmatched[1:]), sorted([
+                u'事実\t\t\tno entry\t明白な事実。',
+                u'好き\t\t\tno entry\t生が好きだ。',
+                u'聞く\t\t\tno entry\t生の声を聞いた。',
+                u'飲む\t\t\tno entry\t生で飲む。',
+                u'居る\t\t\tno entry\t犬がいる。',
+                u'鳥\t\t\tno entry\t犬と猫と鳥。',
+                u'吠える\t\t\tno entry\t狗が吠える。',
+                u'飼う\t\t\tno entry\t犬を飼う。',
+                u'生\tしょう\t\treading\t生きる。',
+                u'犬\t\t5\tno sense 5 in 1000040\t犬がいる。',
+                u'生\t\t2\tno sense 2 in 1000030\t生の声を聞いた。',
+            ]))
+            self.assertEqual(ambiguous[0], u'2')
+            self.assertEqual(sorted(ambiguous[1:]), [
+                u'生\t\t\t1000020,1000030\t生で飲む。',
+                u'生\t\t2\t1000020,1000030\t生の声を聞いた。',
+            ])
+            if isinstance(example_dict, ExampleIndex):
+                example_dict.close()
+
+    @unittest.skipIf(os.name == 'nt', "needs the resource module")
+    def test_streaming_memory(self):
+        env = dict(os.environ, PYTHONPATH=ROOT_DIR)
+        peaks = list()
+        for count in (10000, 200000):
+            output = subprocess.check_output([sys.executable, '-c', STREAMING_SCRIPT, str(count)],
+                                             env=env)
+            peaks.append(int(output))
+        # Kept entries would take well over 10 MB for the extra 190k
+        # (ru_maxrss is in KB on Linux, bytes on OS X)
+        limit = 5 << 10 if sys.platform != 'darwin' else 5 << 20
+        self.assertLess(peaks[1] - peaks[0], limit)
+
+if __name__ == '__main__':
+    unittest.main()
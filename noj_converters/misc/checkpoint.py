@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+from compressed import compression
+
+# Entries converted between two checkpoints
+CHECKPOINT_INTERVAL = 1000
+
+class Checkpoint(object):
+    """Records how far a conversion got, so that ``--resume`` can carry on.
+
+    The state is kept as JSON in ``out_path + '.checkpoint'``. Every
+    ``interval`` entries ``save`` flushes the sink and records the input
+    offset just past the last converted entry, the output offset and any
+    extra counters the converter passes. ``load`` returns the last saved
+    state, and ``finish`` removes the file once the output is complete.
+    ``settings`` are options that must not change between the interrupted
+    run and the resumed one.
+
+    An ``interval`` of 0 turns checkpoints off, and so does a compressed
+    output, which can't be cut back to a checkpoint.
+    """
+
+    def __init__(self, out_path, input_path, interval=CHECKPOINT_INTERVAL, settings=None):
+        super(Checkpoint, self).__init__()
+        self.path = out_path + '.checkpoint'
+        self.input_path = input_path
+        self.interval = interval if compression(out_path) is None else 0
+        self.settings = settings or dict()
+        self.entries = 0
+
+    def load(self):
+        """Return the saved state as a dict, or None if there is none."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as f:
+            state = json.load(f)
+        if state['input_size'] != os.path.getsize(self.input_path):
+            raise Exception("{} changed since the checkpoint was saved.".format(self.input_path))
+        if state['settings'] != self.settings:
+            raise Exception("The checkpoint was saved with different options: {}".format(
+                state['settings']))
+        self.entries = state['entries']
+        return state
+
+    def due(self):
+        """Count a converted entry; True when a checkpoint should be saved."""
+        self.entries += 1
+        return self.interval > 0 and self.entries % self.interval == 0
+
+    def save(self, sink, input_offset, **extra):
+        state = dict(extra)
+        state.update(input_offset=input_offset, output_offset=sink.tell(),
+                     entries=self.entries, input_size=os.path.getsize(self.input_path),
+                     settings=self.settings)
+        # Written next to the old checkpoint and then renamed over it, so
+        # there always is a complete one
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        if os.name == 'nt' and os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(tmp_path, self.path)
+
+    def finish(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Transparent ``.gz``, ``.bz2`` and ``.xz`` input and output.
+
+``open_input`` and ``open_output`` pick the compression from the file
+name and return a plain file for anything else. ``.xz`` needs the
+``backports.lzma`` package on Python 2.
+"""
+
+import bz2
+import collections
+import gzip
+import zlib
+
+COMPRESSIONS = ('gz', 'bz2', 'xz')
+
+# Compressed bytes read from disk at a time
+RAW_READ_SIZE = 1 << 16
+
+def _lzma():
+    try:
+        import lzma
+    except ImportError:
+        try:
+            from backports import lzma
+        except ImportError:
+            raise Exception("Reading or writing .xz files needs the backports.lzma package.")
+    return lzma
+
+def compression(path):
+    """Return 'gz', 'bz2', 'xz' or None for ``path``."""
+    for name in COMPRESSIONS:
+        if path.endswith('.' + name):
+            return name
+    return None
+
+def _decompressor_factory(name):
+    if name == 'gz':
+        return lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if name == 'bz2':
+        return bz2.BZ2Decompressor
+    return _lzma().LZMADecompressor
+
+class DecompressedFile(object):
+    """Read-only binary file that decompresses as it is read.
+
+    ``tell`` is the position in the decompressed data. Concatenated
+    streams (as written by pigz, pbzip2 or ``cat``) are read one after
+    the other. For progress reporting, ``compressed_offset`` maps a
+    decompressed position back to the position on disk; it assumes the
+    positions asked for never go backwards.
+    """
+
+    def __init__(self, path, name):
+        super(DecompressedFile, self).__init__()
+        self.name = path
+        self.raw = open(path, 'rb')
+        self._new_decompressor = _decompressor_factory(name)
+        self._rewind()
+
+    def _rewind(self):
+        self.raw.seek(0)
+        self._decompressor = self._new_decompressor()
+        self._buffer = b''
+        self._offset = 0 # start of the unread part of _buffer
+        self._pos = 0
+        self._eof = False
+        # (decompressed end, compressed end) of each raw read still ahead
+        # of the consumer
+        self._checkpoints = collections.deque()
+        self._decompressed = 0
+
+    def _decompress(self, data):
+        parts = list()
+        while data:
+            parts.append(self._decompressor.decompress(data))
+            # Anything past the end of a stream starts the next one
+            data = self._decompressor.unused_data
+            if data:
+                self._decompressor = self._new_decompressor()
+        return b''.join(parts)
+
+    def _fill(self):
+        data = self.raw.read(RAW_READ_SIZE)
+        if not data:
+            self._eof = True
+            return
+        out = self._decompress(data)
+        self._decompressed += len(out)
+        self._checkpoints.append((self._decompressed, self.raw.tell()))
+        if self._offset:
+            self._buffer = self._buffer[self._offset:]
+            self._offset = 0
+        self._buffer += out
+
+    def read(self, size=-1):
+        while not self._eof and (size < 0 or len(self._buffer) - self._offset < size):
+            self._fill()
+        if size < 0:
+            end = len(self._buffer)
+        else:
+            end = min(self._offset + size, len(self._buffer))
+        data = self._buffer[self._offset:end]
+        self._offset = end
+        self._pos += len(data)
+        return data
+
+    def readline(self, size=-1):
+        while True:
+            end = self._buffer.find(b'\n', self._offset)
+            if end != -1 or self._eof:
+                break
+            self._fill()
+        end = len(self._buffer) if end == -1 else end + 1
+        if size >= 0:
+            end = min(end, self._offset + size)
+        data = self._buffer[self._offset:end]
+        self._offset = end
+        self._pos += len(data)
+        return data
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, pos):
+        """Seek to position ``pos`` in the decompressed data. Everything in
+        between is decompressed and dropped; seeking back starts over from
+        the beginning of the file."""
+        if pos < self._pos:
+            self._rewind()
+        while self._pos < pos:
+            if not self.read(min(pos - self._pos, RAW_READ_SIZE)):
+                break
+
+    def compressed_offset(self, pos):
+        checkpoints = self._checkpoints
+        while len(checkpoints) > 1 and checkpoints[0][0] < pos:
+            checkpoints.popleft()
+        if not checkpoints:
+            return self.raw.tell()
+        return checkpoints[0][1]
+
+    def close(self):
+        self.raw.close()
+
+    @property
+    def closed(self):
+        return self.raw.closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def open_input(path):
+    """Open ``path`` for reading in binary mode, decompressing if needed."""
+    name = compression(path)
+    if name is None:
+        return open(path, 'rb')
+    return DecompressedFile(path, name)
+
+def open_output(path, resume_at=None):
+    """Open ``path`` for writing in binary mode, compressing if needed.
+
+    With ``resume_at``, the existing file is cut back to that many bytes
+    and written on from there instead; compressed files can't be resumed.
+    """
+    name = compression(path)
+    if resume_at is not None:
+        if name is not None:
+            raise Exception("Can't resume writing a compressed file.")
+        f = open(path, 'r+b')
+        f.truncate(resume_at)
+        f.seek(resume_at)
+        return f
+    if name == 'gz':
+        return gzip.open(path, 'wb')
+    if name == 'bz2':
+        return bz2.BZ2File(path, 'wb')
+    if name == 'xz':
+        return _lzma().open(path, 'wb')
+    return open(path, 'wb')
+
+def compressed_offset(f, pos):
+    """Map position ``pos`` in the data read from ``f`` (as returned by
+    ``open_input``) to a position in the file on disk."""
+    if isinstance(f, DecompressedFile):
+        return f.compressed_offset(pos)
+    return pos
+
+def with_disk_offsets(f, items):
+    """Turn the ``(data, pos)`` pairs read from ``f`` into ``(data, (pos,
+    disk_pos))``, where ``disk_pos`` is ``compressed_offset(f, pos)``.
+
+    The offsets are mapped as the items are read, so when a pipeline
+    reads ahead, ``f`` is only used from its reader thread.
+    """
+    for data, pos in items:
+        yield data, (pos, compressed_offset(f, pos))
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Same indentation as lxml's pretty_print
+INDENT = b'  '
+
+def escape_text(text):
+    """Escape UTF-8 element text the way libxml2 serializes it."""
+    if b'&' in text:
+        text = text.replace(b'&', b'&amp;')
+    if b'<' in text:
+        text = text.replace(b'<', b'&lt;')
+    if b'>' in text:
+        text = text.replace(b'>', b'&gt;')
+    if b'\r' in text:
+        text = text.replace(b'\r', b'&#13;')
+    return text
+
+def escape_attrib(value):
+    """Escape a UTF-8 attribute value the way libxml2 serializes it."""
+    value = escape_text(value)
+    if b'"' in value:
+        value = value.replace(b'"', b'&quot;')
+    if b'\n' in value:
+        value = value.replace(b'\n', b'&#10;')
+    if b'\t' in value:
+        value = value.replace(b'\t', b'&#9;')
+    return value
+
+def utf8(s):
+    if isinstance(s, unicode):
+        return s.encode('utf-8')
+    return s
+
+class Node(object):
+    """Lightweight output element built by the converters.
+
+    It has the small part of the lxml element API the converters use
+    (``text``, ``set``, ``get``, ``append`` and iterating over the
+    children), but none of the cost of lxml's C tree. The sinks serialize
+    it directly. Attributes are kept as ``(name, value)`` pairs so that
+    they are written in the order they were set.
+    """
+
+    __slots__ = ('tag', 'attrib', 'text', 'children')
+
+    def __init__(self, tag, attrib=None, **extra):
+        self.tag = tag
+        self.attrib = list()
+        if attrib:
+            self.attrib.extend(attrib.items())
+        if extra:
+            self.attrib.extend(sorted(extra.items()))
+        self.text = None
+        self.children = list()
+
+    def set(self, name, value):
+        for i, (key, old) in enumerate(self.attrib):
+            if key == name:
+                self.attrib[i] = (name, value)
+                return
+        self.attrib.append((name, value))
+
+    def get(self, name, default=None):
+        for key, value in self.attrib:
+            if key == name:
+                return value
+        return default
+
+    def append(self, child):
+        self.children.append(child)
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def findall(self, tag):
+        return [child for child in self.children if child.tag == tag]
+
+    def findtext(self, tag, default=None):
+        for child in self.children:
+            if child.tag == tag:
+                return child.text or ''
+        return default
+
+    def iter(self):
+        yield self
+        for child in self.children:
+            for node in child.iter():
+                yield node
+
+    def to_tuple(self):
+        """Return the tree as nested ``(tag, attrib, text, children)``
+        tuples, with ``attrib`` a list of ``(name, value)`` pairs."""
+        return (self.tag, self.attrib, self.text,
+                [child.to_tuple() for child in self.children])
+
+    @classmethod
+    def from_tuple(cls, t):
+        tag, attrib, text, children = t
+        node = cls(tag)
+        node.attrib = list(attrib)
+        node.text = text
+        node.children = [cls.from_tuple(child) for child in children]
+        return node
+
+    def to_xml(self, pretty_print=True):
+        """Serialize the tree to UTF-8 XML without building lxml elements.
+
+        The result is what lxml's ``tostring`` gives for ``to_element()``
+        (without the trailing newline ``pretty_print`` adds): two space
+        indents, ``<x></x>`` for an empty text and ``<x/>`` for none, and
+        no indenting inside elements that have both text and children.
+        Tags and attribute names must be byte strings without namespaces.
+        """
+        parts = list()
+        _write(self, parts, b'\n' if pretty_print else None)
+        return b''.join(parts)
+
+    def to_element(self, parent=None):
+        """Build the equivalent lxml element."""
+        # Only needed here, so converting doesn't have to load lxml
+        from lxml import etree
+        if parent is None:
+            elem = etree.Element(self.tag)
+        else:
+            elem = etree.SubElement(parent, self.tag)
+        for name, value in self.attrib:
+            elem.set(name, value)
+        elem.text = self.text
+        for child in self.children:
+            child.to_element(elem)
+        return elem
+
+def _write(node, parts, indent):
+    """Append the serialization of ``node`` to ``parts``.
+
+    ``indent`` is the newline and indentation in front of the node's
+    closing tag, or None when not pretty printing. Everything is built as
+    UTF-8 byte strings: the tags are byte strings, and mixing them with
+    unicode would decode them over and over.
+    """
+    append = parts.append
+    tag = node.tag
+    append(b'<' + tag)
+    for name, value in node.attrib:
+        append(b' ' + name + b'="' + escape_attrib(utf8(value)) + b'"')
+    text = node.text
+    if text is not None:
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        if b'&' in text or b'<' in text or b'>' in text or b'\r' in text:
+            text = escape_text(text)
+    children = node.children
+    if not children:
+        if text is None:
+            append(b'/>')
+        else:
+            append(b'>' + text + b'</' + tag + b'>')
+        return
+    if text is not None:
+        append(b'>' + text)
+        indent = None
+    else:
+        append(b'>')
+    if indent is None:
+        for child in children:
+            _write(child, parts, None)
+        append(b'</' + tag + b'>')
+        return
+    child_indent = indent + INDENT
+    for child in children:
+        child_text = child.text
+        if child.children or child.attrib or child_text is None:
+            append(child_indent)
+            _write(child, parts, child_indent)
+            continue
+        # A text-only leaf, by far the most common node; written here to
+        # save a call per node
+        if isinstance(child_text, unicode):
+            child_text = child_text.encode('utf-8')
+        if b'&' in child_text or b'<' in child_text or b'>' in child_text or b'\r' in child_text:
+            child_text = escape_text(child_text)
+        child_tag = child.tag
+        append(child_indent + b'<' + child_tag + b'>' + child_text + b'</' + child_tag + b'>')
+    append(indent + b'</' + tag + b'>')
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Fragments a FragmentCache keeps before it starts over
+FRAGMENT_CACHE_SIZE = 10000
+
+class FragmentCache(object):
+    """Shared copies of one kind of small string the converters build
+    for every entry, e.g. the ``(n,vs)`` part of speech lines, most of
+    which come up over and over.
+
+    ``join(parts)`` returns ``prefix + sep.join(parts) + suffix``,
+    building it only the first time those parts are seen and handing out
+    the same string after that. Once ``max_size`` fragments are kept the
+    cache is emptied and refills with the ones still in use. ``hits`` and
+    ``misses`` count the lookups of this process.
+    """
+
+    def __init__(self, prefix, sep, suffix, max_size=FRAGMENT_CACHE_SIZE):
+        super(FragmentCache, self).__init__()
+        self.prefix = prefix
+        self.sep = sep
+        self.suffix = suffix
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._fragments = dict()
+
+    def join(self, parts):
+        key = tuple(parts)
+        try:
+            fragment = self._fragments[key]
+        except KeyError:
+            self.misses += 1
+            if len(self._fragments) >= self.max_size:
+                self._fragments.clear()
+            fragment = self._fragments[key] = self.prefix + self.sep.join(parts) + self.suffix
+            return fragment
+        self.hits += 1
+        return fragment
+
+    def __len__(self):
+        return len(self._fragments)
+
+def fragment_stats(caches):
+    """Return the ``(hits, misses)`` of ``caches`` added up."""
+    return sum(c.hits for c in caches), sum(c.misses for c in caches)
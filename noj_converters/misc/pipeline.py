@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import Queue
+import sys
+import threading
+import time
+
+# Items passed through a queue at a time
+PIPELINE_BATCH_SIZE = 64
+# Batches a queue holds before its producer has to wait
+PIPELINE_QUEUE_SIZE = 16
+
+# Put in a queue by its producer after the last batch, with the
+# exception that stopped it, if any
+class _Done(object):
+    def __init__(self, exc_info=None):
+        self.exc_info = exc_info
+
+class QueueStats(object):
+    """Depth and stall times of one pipeline queue.
+
+    ``producer_stall`` is the time the producer spent waiting for room in
+    the full queue, i.e. the consumer was the bottleneck, and
+    ``consumer_stall`` the time the consumer spent waiting on the empty
+    queue. The depth, in batches, is sampled after every put.
+    """
+
+    def __init__(self, name, size):
+        super(QueueStats, self).__init__()
+        self.name = name
+        self.size = size
+        self.batches = 0
+        self.depth_total = 0
+        self.max_depth = 0
+        self.producer_stall = 0.0
+        self.consumer_stall = 0.0
+
+    def mean_depth(self):
+        return float(self.depth_total) / self.batches if self.batches else 0.0
+
+    def report(self):
+        return {'name': self.name,
+                'queue_size': self.size,
+                'batches': self.batches,
+                'mean_depth': self.mean_depth(),
+                'max_depth': self.max_depth,
+                'producer_stall_seconds': self.producer_stall,
+                'consumer_stall_seconds': self.consumer_stall}
+
+    def __str__(self):
+        return ("{} queue: mean depth {:.1f}/{}, producer stalled {:.2f} s, "
+                "consumer stalled {:.2f} s".format(self.name, self.mean_depth(), self.size,
+                                                   self.producer_stall, self.consumer_stall))
+
+class _StatsQueue(object):
+    """A bounded Queue.Queue that records its QueueStats."""
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.queue = Queue.Queue(stats.size)
+
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except Queue.Full:
+            start = time.time()
+            self.queue.put(item)
+            self.stats.producer_stall += time.time() - start
+        if isinstance(item, _Done):
+            return
+        depth = self.queue.qsize()
+        self.stats.batches += 1
+        self.stats.depth_total += depth
+        self.stats.max_depth = max(self.stats.max_depth, depth)
+
+    def get(self):
+        try:
+            return self.queue.get_nowait()
+        except Queue.Empty:
+            start = time.time()
+            item = self.queue.get()
+            self.stats.consumer_stall += time.time() - start
+            return item
+
+class NullPipeline(object):
+    """Runs every stage in the calling thread; used when pipelining is
+    off."""
+
+    queues = ()
+
+    def read_ahead(self, iterable, name):
+        return iterable
+
+    def write_behind(self, write, name):
+        return _WriteThrough(write)
+
+class Pipeline(object):
+    """Overlaps reading, converting and writing by running the reader
+    and the writer in threads of their own, connected to the converting
+    thread by bounded queues. A full queue makes its producer wait, so
+    at most ``queue_size`` batches of ``batch_size`` items are held
+    between two stages. Items keep their order.
+
+    ``queues`` collects the QueueStats of every queue created.
+    """
+
+    def __init__(self, queue_size=PIPELINE_QUEUE_SIZE, batch_size=PIPELINE_BATCH_SIZE):
+        super(Pipeline, self).__init__()
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.queues = list()
+
+    def _queue(self, name):
+        stats = QueueStats(name, self.queue_size)
+        self.queues.append(stats)
+        return _StatsQueue(stats)
+
+    def read_ahead(self, iterable, name):
+        """Iterate over ``iterable`` in a reader thread, yielding the same
+        items. An exception raised by ``iterable`` is re-raised here.
+        The thread starts with the first item asked for."""
+        return self._read_ahead(iterable, self._queue(name), name)
+
+    def _read_ahead(self, iterable, queue, name):
+        stopped = threading.Event()
+
+        def produce():
+            exc_info = None
+            try:
+                batch = list()
+                for item in iterable:
+                    batch.append(item)
+                    if len(batch) == self.batch_size:
+                        queue.put(batch)
+                        batch = list()
+                        if stopped.is_set():
+                            return
+                if batch:
+                    queue.put(batch)
+            except BaseException:
+                exc_info = sys.exc_info()
+            finally:
+                queue.put(_Done(exc_info))
+
+        thread = threading.Thread(target=produce, name=name)
+        thread.daemon = True
+        thread.start()
+        done = False
+        try:
+            while True:
+                batch = queue.get()
+                if isinstance(batch, _Done):
+                    done = True
+                    if batch.exc_info is not None:
+                        raise batch.exc_info[0], batch.exc_info[1], batch.exc_info[2]
+                    return
+                for item in batch:
+                    yield item
+        finally:
+            # Stopped early: empty the queue so the reader can finish
+            stopped.set()
+            while not done:
+                done = isinstance(queue.get(), _Done)
+            thread.join()
+
+    def write_behind(self, write, name):
+        """Return a writer whose ``put(item)`` hands ``item`` to
+        ``write`` in a writer thread. Use it as a context manager: on a
+        clean exit it waits for every item to be written, on an exception
+        it drops the items still queued. An exception raised by ``write``
+        is re-raised by the next ``put`` or on exit."""
+        return _WriteBehind(write, self._queue(name), self.batch_size, name)
+
+class _WriteThrough(object):
+    def __init__(self, write):
+        self.put = write
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+class _WriteBehind(object):
+    def __init__(self, write, queue, batch_size, name):
+        self.write = write
+        self.queue = queue
+        self.batch_size = batch_size
+        self.batch = list()
+        self.stopped = threading.Event()
+        self.exc_info = None
+        self.thread = threading.Thread(target=self._consume, name=name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _consume(self):
+        while True:
+            batch = self.queue.get()
+            if isinstance(batch, _Done):
+                return
+            # After a failure or an abort the rest is only drained
+            if self.exc_info is not None or self.stopped.is_set():
+                continue
+            try:
+                for item in batch:
+                    self.write(item)
+            except BaseException:
+                self.exc_info = sys.exc_info()
+
+    def _raise_error(self):
+        if self.exc_info is not None:
+            exc_info, self.exc_info = self.exc_info, None
+            self.stopped.set()
+            raise exc_info[0], exc_info[1], exc_info[2]
+
+    def put(self, item):
+        self.batch.append(item)
+        if len(self.batch) == self.batch_size:
+            self._raise_error()
+            self.queue.put(self.batch)
+            self.batch = list()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is not None:
+            self.stopped.set()
+        elif self.batch:
+            self.queue.put(self.batch)
+        self.batch = list()
+        self.queue.put(_Done())
+        self.thread.join()
+        if exc_type is None:
+            self._raise_error()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import collections
+import multiprocessing
+
+# Tasks handed to a pool worker at a time, for tasks that take about as
+# long as converting a JMdict entry
+POOL_CHUNK_SIZE = 256
+# Chunks in flight per worker before the reader waits for results
+POOL_CHUNKS_PER_WORKER = 4
+
+def ordered_chunks(pool, func, tasks, chunk_size, max_pending):
+    """Run ``func`` over ``tasks`` in a pool, yielding results in order.
+
+    Tasks are grouped into lists of ``chunk_size`` and ``func`` is called
+    with one such list, returning one result per chunk. At most
+    ``max_pending`` chunks are in flight at any time, so the input is
+    never read far ahead of the consumer.
+    """
+    pending = collections.deque()
+    chunk = list()
+    for task in tasks:
+        chunk.append(task)
+        if len(chunk) == chunk_size:
+            pending.append(pool.apply_async(func, (chunk,)))
+            chunk = list()
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+    if chunk:
+        pending.append(pool.apply_async(func, (chunk,)))
+    while pending:
+        yield pending.popleft().get()
+
+# What run_in_pool handed the worker, so that it isn't pickled with
+# every chunk
+_worker_state = None
+
+def _pool_init(state):
+    global _worker_state
+    _worker_state = state
+
+def worker_state():
+    """Return the ``state`` given to ``run_in_pool``; for use in ``func``."""
+    return _worker_state
+
+def run_in_pool(func, tasks, workers, state, cost=1):
+    """``ordered_chunks`` in a pool of ``workers`` processes.
+
+    ``state`` (e.g. the converter) is given to each worker once at
+    startup, inherited on fork. ``cost`` is how many times as long a task
+    takes as converting a JMdict entry; chunks get that much smaller.
+    """
+    chunk_size = max(1, POOL_CHUNK_SIZE // cost)
+    pool = multiprocessing.Pool(workers, _pool_init, (state,))
+    try:
+        for result in ordered_chunks(pool, func, tasks, chunk_size,
+                                     workers * POOL_CHUNKS_PER_WORKER):
+            yield result
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
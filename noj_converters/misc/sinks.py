@@ -0,0 +1,493 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Output formats for converted entries.
+
+Every sink takes the dictionary metadata once and then the converted
+entries, as ``Node`` trees, in order:
+
+xml      NOJ XML, the format the importer has always read.
+jsonl    JSON Lines. The first line is the metadata as an object, every
+         further line one entry as ``[tag, {attrib}, text, [children]]``.
+         Non-ASCII characters are written as \\u escapes, which keeps
+         the json module on its C encoder.
+sqlite   A ``meta`` table, an ``entries`` table holding the same JSON
+         arrays, and ``kana`` and ``kanji`` tables with an index on the
+         headword pointing back to ``entries.id``.
+msgpack  The same objects as jsonl packed back to back with MessagePack
+         (needs the ``msgpack`` package).
+
+The xml, jsonl and msgpack sinks compress their output when ``path``
+ends in ``.gz``, ``.bz2`` or ``.xz``.
+
+A sink opened with ``resume_at`` (a position returned by ``tell`` in
+an earlier run) carries on with an existing output instead of starting
+a new one; everything written after that position is dropped.
+
+``ShardedSink`` splits the output over several complete documents of
+any of these formats; see its docstring.
+
+The metadata is flattened to ``{tag: text}`` for all but the XML sink,
+with the root element's plain attributes (``schema_version``) added.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import zlib
+from entry_tree import Node, escape_attrib, utf8
+from compressed import compression, open_output
+
+FORMATS = ('xml', 'jsonl', 'sqlite', 'msgpack')
+EXTENSIONS = {'xml': '.xml', 'jsonl': '.jsonl', 'sqlite': '.sqlite', 'msgpack': '.msgpack'}
+
+# Entries inserted per executemany call
+SQLITE_BATCH_SIZE = 1000
+
+# Ways of splitting the output into shards
+SHARD_SPLITS = ('entries', 'size', 'kana')
+
+def entry_record(node):
+    """Return a ``Node`` tree as nested ``[tag, {attrib}, text, [children]]`` lists."""
+    return [node.tag, dict(node.attrib), node.text,
+            [entry_record(child) for child in node.children]]
+
+def meta_record(meta, root_attrib):
+    record = dict((name, value) for name, value in root_attrib.items()
+                  if not name.startswith('{'))
+    for child in meta:
+        record[child.tag] = child.text
+    return record
+
+class Sink(object):
+    """Base class; ``root_tag``, ``root_attrib`` and ``nsmap`` describe the
+    XML root element."""
+
+    def __init__(self, path, root_tag, root_attrib=None, nsmap=None, resume_at=None):
+        super(Sink, self).__init__()
+        self.path = path
+        self.root_tag = root_tag
+        self.root_attrib = root_attrib or dict()
+        self.nsmap = nsmap
+        self.resume_at = resume_at
+
+    def write_meta(self, meta):
+        raise NotImplementedError
+
+    def write(self, entry):
+        raise NotImplementedError
+
+    def tell(self):
+        """Flush what was written so far and return the position to pass
+        as ``resume_at`` to carry on from here."""
+        raise NotImplementedError
+
+    def size(self):
+        """Number of bytes written so far, before any compression."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def abort(self):
+        """Close the output without finishing it, when the run failed;
+        what was written up to the last ``tell`` can still be resumed."""
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is not None:
+            self.abort()
+        else:
+            self.close()
+
+class XmlSink(Sink):
+    """Writes each entry's ``Node.to_xml`` straight to the file; the output
+    is the same as writing the equivalent lxml elements with
+    ``etree.xmlfile``."""
+
+    def __init__(self, path, root_tag, root_attrib=None, nsmap=None, pretty_print=True,
+                 resume_at=None):
+        super(XmlSink, self).__init__(path, root_tag, root_attrib, nsmap, resume_at)
+        self.pretty_print = pretty_print
+        self.f = open_output(path, resume_at)
+        if resume_at is None:
+            self.f.write(b"<?xml version='1.0' encoding='utf-8'?>\n")
+            self.f.write(self.start_tag())
+            self.f.write(b'\n')
+
+    def qname(self, name):
+        """Turn a ``{uri}local`` name into ``prefix:local`` using ``nsmap``."""
+        if not name.startswith('{'):
+            return name
+        uri, local = name[1:].split('}', 1)
+        for prefix, ns_uri in (self.nsmap or dict()).items():
+            if ns_uri == uri:
+                return local if prefix is None else prefix + ':' + local
+        raise ValueError("No prefix for namespace {}".format(uri))
+
+    def start_tag(self):
+        parts = [b'<' + self.qname(self.root_tag)]
+        nsmap = self.nsmap or dict()
+        if None in nsmap:
+            parts.append(b' xmlns="' + escape_attrib(utf8(nsmap[None])) + b'"')
+        for prefix in sorted(p for p in nsmap if p is not None):
+            parts.append(b' xmlns:' + prefix + b'="' + escape_attrib(utf8(nsmap[prefix])) + b'"')
+        # lxml sorts attributes given as a dict by their {uri}local name
+        for name, value in sorted(self.root_attrib.items()):
+            parts.append(b' ' + self.qname(name) + b'="' + escape_attrib(utf8(value)) + b'"')
+        return b''.join(parts) + b'>'
+
+    def _write_node(self, node):
+        self.f.write(node.to_xml(self.pretty_print))
+        if self.pretty_print:
+            self.f.write(b'\n')
+
+    def write_meta(self, meta):
+        self._write_node(meta)
+
+    def write(self, entry):
+        self._write_node(entry)
+
+    def tell(self):
+        self.f.flush()
+        return self.f.tell()
+
+    def size(self):
+        return self.f.tell()
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.f.write(b'</' + self.qname(self.root_tag) + b'>')
+        self.f.close()
+
+    def abort(self):
+        # Without the closing tag, so it can't be taken for a whole output
+        self.f.close()
+
+class JsonLinesSink(Sink):
+    def __init__(self, path, root_tag, root_attrib=None, nsmap=None, resume_at=None):
+        super(JsonLinesSink, self).__init__(path, root_tag, root_attrib, nsmap, resume_at)
+        self.f = open_output(path, resume_at)
+
+    def _write_line(self, obj):
+        self.f.write(json.dumps(obj, separators=(',', ':')))
+        self.f.write(b'\n')
+
+    def write_meta(self, meta):
+        self._write_line(meta_record(meta, self.root_attrib))
+
+    def write(self, entry):
+        self._write_line(entry_record(entry))
+
+    def tell(self):
+        self.f.flush()
+        return self.f.tell()
+
+    def size(self):
+        return self.f.tell()
+
+    def close(self):
+        self.f.close()
+
+class SqliteSink(Sink):
+    """Entries are buffered and inserted in batches; they are committed by
+    ``tell`` and ``close``, and the headword indexes are only built in
+    ``close``. ``tell`` returns the number of entries, and resuming
+    deletes the entries after that."""
+
+    def __init__(self, path, root_tag, root_attrib=None, nsmap=None, resume_at=None):
+        super(SqliteSink, self).__init__(path, root_tag, root_attrib, nsmap, resume_at)
+        if resume_at is None and os.path.exists(path):
+            os.remove(path)
+        # A pipeline's writer thread may write the entries, but only one
+        # thread uses the connection at a time
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # Keeps the rollback journal, so that a run killed between two
+        # commits leaves the database as of the last one
+        self.conn.execute('PRAGMA synchronous = OFF')
+        if resume_at is None:
+            self.conn.execute('CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)')
+            self.conn.execute('CREATE TABLE entries (id INTEGER PRIMARY KEY, entry TEXT)')
+            self.conn.execute('CREATE TABLE kana (entry_id INTEGER, kana TEXT)')
+            self.conn.execute('CREATE TABLE kanji (entry_id INTEGER, kanji TEXT)')
+        else:
+            self.conn.execute('DROP INDEX IF EXISTS kana_index')
+            self.conn.execute('DROP INDEX IF EXISTS kanji_index')
+            self.conn.execute('DELETE FROM entries WHERE id > ?', (resume_at,))
+            self.conn.execute('DELETE FROM kana WHERE entry_id > ?', (resume_at,))
+            self.conn.execute('DELETE FROM kanji WHERE entry_id > ?', (resume_at,))
+        self.entry_id = resume_at or 0
+        # Only counts the entries' JSON, which is most of the database
+        self.bytes_written = 0
+        self.entries = list()
+        self.kana = list()
+        self.kanji = list()
+
+    def write_meta(self, meta):
+        self.conn.executemany('INSERT INTO meta VALUES (?, ?)',
+                              meta_record(meta, self.root_attrib).items())
+
+    def write(self, entry):
+        self.entry_id += 1
+        record = json.dumps(entry_record(entry), separators=(',', ':'))
+        self.bytes_written += len(record)
+        self.entries.append((self.entry_id, record))
+        for child in entry.children:
+            if child.tag == 'kana':
+                self.kana.append((self.entry_id, child.text))
+            elif child.tag == 'kanji':
+                self.kanji.append((self.entry_id, child.text))
+        if len(self.entries) >= SQLITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        self.conn.executemany('INSERT INTO entries VALUES (?, ?)', self.entries)
+        self.conn.executemany('INSERT INTO kana VALUES (?, ?)', self.kana)
+        self.conn.executemany('INSERT INTO kanji VALUES (?, ?)', self.kanji)
+        self.entries = list()
+        self.kana = list()
+        self.kanji = list()
+
+    def tell(self):
+        self.flush()
+        self.conn.commit()
+        return self.entry_id
+
+    def size(self):
+        return self.bytes_written
+
+    def close(self):
+        if self.conn is None:
+            return
+        self.flush()
+        self.conn.execute('CREATE INDEX kana_index ON kana (kana)')
+        self.conn.execute('CREATE INDEX kanji_index ON kanji (kanji)')
+        self.conn.commit()
+        self.conn.close()
+        self.conn = None
+
+    def abort(self):
+        # Rolls back to the last tell, without the indexes
+        if self.conn is None:
+            return
+        self.conn.close()
+        self.conn = None
+
+class MsgpackSink(Sink):
+    def __init__(self, path, root_tag, root_attrib=None, nsmap=None, resume_at=None):
+        super(MsgpackSink, self).__init__(path, root_tag, root_attrib, nsmap, resume_at)
+        try:
+            import msgpack
+        except ImportError:
+            raise Exception("The msgpack output format needs the msgpack package.")
+        # Byte strings (ASCII literals in the converters) are packed as
+        # strings too, not as binary
+        self.packer = msgpack.Packer(use_bin_type=False)
+        self.f = open_output(path, resume_at)
+
+    def write_meta(self, meta):
+        self.f.write(self.packer.pack(meta_record(meta, self.root_attrib)))
+
+    def write(self, entry):
+        self.f.write(self.packer.pack(entry_record(entry)))
+
+    def tell(self):
+        self.f.flush()
+        return self.f.tell()
+
+    def size(self):
+        return self.f.tell()
+
+    def close(self):
+        self.f.close()
+
+SIZE_SUFFIXES = {'k': 1 << 10, 'm': 1 << 20, 'g': 1 << 30}
+
+def parse_shard_split(text):
+    """Parse ``entries:N``, ``size:N`` (with an optional K, M or G suffix)
+    or ``kana:N`` into a ``ShardedSink`` split; for argparse's ``type``."""
+    split, sep, limit = text.lower().partition(':')
+    multiplier = 1
+    if split == 'size' and limit[-1:] in SIZE_SUFFIXES:
+        multiplier = SIZE_SUFFIXES[limit[-1]]
+        limit = limit[:-1]
+    if split not in SHARD_SPLITS or not limit.isdigit() or int(limit) < 1:
+        raise argparse.ArgumentTypeError(
+            "expected entries:N, size:N[K|M|G] or kana:N, not {!r}".format(text))
+    return (split, int(limit) * multiplier)
+
+def shard_path(path, index):
+    """``dict.xml.gz`` -> ``dict.003.xml.gz``"""
+    suffix = compression(path)
+    if suffix is not None:
+        path = path[:-len(suffix) - 1]
+    root, ext = os.path.splitext(path)
+    path = '{}.{:03d}{}'.format(root, index, ext)
+    if suffix is not None:
+        path += '.' + suffix
+    return path
+
+def shard_manifest_path(path):
+    """``dict.xml.gz`` -> ``dict.shards.json``"""
+    suffix = compression(path)
+    if suffix is not None:
+        path = path[:-len(suffix) - 1]
+    return os.path.splitext(path)[0] + '.shards.json'
+
+def entry_kana(entry):
+    for child in entry.children:
+        if child.tag == 'kana':
+            return child.text or u''
+    return u''
+
+class ShardedSink(Sink):
+    """Splits the entries over several shards, each a complete output of
+    ``output_format`` with its own metadata, so that they can be loaded
+    independently. ``split`` is one of
+
+    ('entries', N)  a new shard every N entries;
+    ('size', N)     a new shard once a shard holds N bytes (before any
+                    compression; for sqlite, of entry JSON);
+    ('kana', N)     N shards, each entry going to the one picked by the
+                    CRC-32 of its first kana, so the same headword always
+                    ends up in the same shard.
+
+    Shard ``i`` is written to ``shard_path(path, i)``. ``close`` writes
+    ``shard_manifest_path(path)``, a JSON object listing the shards with
+    their entry counts, sizes and, when split by entries or size, the
+    range of entries (numbered from 0 in input order) each one holds.
+    ``abort`` writes no manifest, and removes the one of an earlier run.
+
+    ``tell`` returns the state of all open shards, so a sharded output
+    can be resumed like any other.
+    """
+
+    def __init__(self, output_format, path, root_tag, root_attrib=None, nsmap=None,
+                 pretty_print=True, resume_at=None, split=('entries', 10000)):
+        super(ShardedSink, self).__init__(path, root_tag, root_attrib, nsmap, resume_at)
+        self.output_format = output_format
+        self.pretty_print = pretty_print
+        self.split, self.limit = split
+        if self.split not in SHARD_SPLITS or self.limit < 1:
+            raise ValueError("Bad shard split {!r}".format(split))
+        self.meta = None
+        self.entries = 0
+        self.shards = list()
+        self.sinks = dict() # shard index -> open sink
+        if resume_at is not None:
+            if resume_at['meta'] is not None:
+                self.meta = Node.from_tuple(resume_at['meta'])
+            self.entries = resume_at['entries']
+            for index, shard in enumerate(resume_at['shards']):
+                shard = dict(shard)
+                shard_resume_at = shard.pop('resume_at', None)
+                if shard_resume_at is not None:
+                    self.sinks[index] = self._open(index, shard_resume_at)
+                self.shards.append(shard)
+
+    def _open(self, index, resume_at=None):
+        return open_sink(self.output_format, shard_path(self.path, index), self.root_tag,
+                         self.root_attrib, self.nsmap, self.pretty_print, resume_at)
+
+    def _new_shard(self):
+        index = len(self.shards)
+        shard = {'path': os.path.basename(shard_path(self.path, index)), 'entries': 0}
+        if self.split == 'kana':
+            shard['kana_hash'] = index
+        self.shards.append(shard)
+        sink = self.sinks[index] = self._open(index)
+        if self.meta is not None:
+            sink.write_meta(self.meta)
+        return index
+
+    def write_meta(self, meta):
+        self.meta = meta
+        if self.split == 'kana':
+            for i in range(self.limit):
+                self._new_shard()
+
+    def write(self, entry):
+        if self.split == 'kana':
+            index = (zlib.crc32(utf8(entry_kana(entry))) & 0xffffffff) % self.limit
+        elif self.sinks:
+            index = len(self.shards) - 1
+        else:
+            index = self._new_shard()
+        shard = self.shards[index]
+        if self.split != 'kana':
+            if not shard['entries']:
+                shard['first_entry'] = self.entries
+            shard['last_entry'] = self.entries
+        shard['entries'] += 1
+        self.entries += 1
+        sink = self.sinks[index]
+        sink.write(entry)
+        if self.split == 'entries':
+            full = shard['entries'] >= self.limit
+        elif self.split == 'size':
+            full = sink.size() >= self.limit
+        else:
+            full = False
+        if full:
+            sink.close()
+            del self.sinks[index]
+
+    def tell(self):
+        shards = list()
+        for index, shard in enumerate(self.shards):
+            shard = dict(shard)
+            if index in self.sinks:
+                shard['resume_at'] = self.sinks[index].tell()
+            shards.append(shard)
+        meta = None
+        if self.meta is not None:
+            meta = self.meta.to_tuple()
+        return {'meta': meta, 'entries': self.entries, 'shards': shards}
+
+    def size(self):
+        return sum(sink.size() for sink in self.sinks.values())
+
+    def close(self):
+        if self.shards is None:
+            return
+        if not self.shards:
+            self._new_shard()
+        for index in sorted(self.sinks):
+            self.sinks[index].close()
+        self.sinks = dict()
+        manifest_path = shard_manifest_path(self.path)
+        directory = os.path.dirname(manifest_path)
+        for shard in self.shards:
+            shard['bytes'] = os.path.getsize(os.path.join(directory, shard['path']))
+        with open(manifest_path, 'wb') as f:
+            json.dump({'format': self.output_format, 'split': self.split, 'limit': self.limit,
+                       'entries': self.entries, 'shards': self.shards},
+                      f, indent=2, sort_keys=True)
+        self.shards = None
+
+    def abort(self):
+        if self.shards is None:
+            return
+        for index in sorted(self.sinks):
+            self.sinks[index].abort()
+        self.sinks = dict()
+        manifest_path = shard_manifest_path(self.path)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        self.shards = None
+
+SINKS = {'xml': XmlSink, 'jsonl': JsonLinesSink, 'sqlite': SqliteSink, 'msgpack': MsgpackSink}
+
+def open_sink(output_format, path, root_tag, root_attrib=None, nsmap=None, pretty_print=True,
+              resume_at=None, shards=None):
+    """``shards`` is a ``ShardedSink`` split, or None for a single output."""
+    if shards is not None:
+        return ShardedSink(output_format, path, root_tag, root_attrib, nsmap, pretty_print,
+                           resume_at, shards)
+    if output_format == 'xml':
+        return XmlSink(path, root_tag, root_attrib, nsmap, pretty_print, resume_at)
+    return SINKS[output_format](path, root_tag, root_attrib, nsmap, resume_at)
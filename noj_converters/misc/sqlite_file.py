@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import sqlite3
+
+class SqliteFile(object):
+    """A SQLite file that can be used from several processes.
+
+    ``conn`` is opened on first use in each process: SQLite connections
+    must not be shared across fork, so a pool worker that inherited the
+    object opens its own. Subclasses override ``connect`` to configure a
+    new connection. Pickling leaves the connection out.
+    """
+
+    def __init__(self, path):
+        super(SqliteFile, self).__init__()
+        self.path = path
+        self._conn = None
+        self._pid = None
+
+    def connect(self):
+        return sqlite3.connect(self.path)
+
+    @property
+    def conn(self):
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = self.connect()
+            self._pid = os.getpid()
+        return self._conn
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_conn=None, _pid=None)
+        return state
+
+    def read_meta(self):
+        """Return the ``meta`` table as a dict, empty if there is none."""
+        try:
+            rows = self.conn.execute('SELECT name, value FROM meta').fetchall()
+        except sqlite3.DatabaseError:
+            return dict()
+        return dict(rows)
+
+    def close(self):
+        # A connection inherited across fork belongs to the parent
+        if self._conn is not None and self._pid == os.getpid():
+            self._conn.close()
+        self._conn = None
+
+class SourceIndex(SqliteFile):
+    """A SQLite file built from a source file, and rebuilt when the
+    source's size or mtime changes or ``version`` does.
+
+    ``build`` writes the index next to the old one and renames it over
+    it, so a reader never sees a half built one. Subclasses set
+    ``version`` and implement ``fill`` to create and fill their tables.
+    """
+
+    version = None
+
+    def __init__(self, source_path, path=None):
+        super(SourceIndex, self).__init__(path or source_path + '.sqlite')
+        self.source_path = source_path
+        if not self.is_current():
+            self.build()
+
+    def source_stat(self):
+        st = os.stat(self.source_path)
+        return str(st.st_size), repr(st.st_mtime)
+
+    def is_current(self):
+        if not os.path.exists(self.path):
+            return False
+        meta = self.read_meta()
+        if meta.get('version') != self.version:
+            return False
+        size, mtime = self.source_stat()
+        if meta.get('size') == size and meta.get('mtime') == mtime:
+            return True
+        return self.same_source(meta, size, mtime)
+
+    def same_source(self, meta, size, mtime):
+        """Whether the source is unchanged even though its size or mtime
+        is not what ``meta`` recorded; by default it never is."""
+        return False
+
+    def extra_meta(self):
+        """More ``(name, value)`` pairs to record in ``meta`` when building."""
+        return []
+
+    def fill(self, conn):
+        raise NotImplementedError
+
+    def build(self):
+        """(Re)build the index from the source file."""
+        self.close()
+        tmp_path = self.path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        size, mtime = self.source_stat()
+        conn = sqlite3.connect(tmp_path)
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT)')
+        self.fill(conn)
+        conn.executemany('INSERT INTO meta VALUES (?, ?)', [
+            ('version', self.version), ('size', size), ('mtime', mtime)] + self.extra_meta())
+        conn.commit()
+        conn.close()
+        if os.name == 'nt' and os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(tmp_path, self.path)
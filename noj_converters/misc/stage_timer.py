@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import bisect
+import contextlib
+import heapq
+import json
+import time
+
+# Upper bounds (milliseconds) of the entry latency histogram buckets; the
+# last bucket counts everything slower
+LATENCY_BUCKETS_MS = [0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+def entry_headword(entry):
+    """Label an output ``<entry>`` as kana【kanji・...】."""
+    if not hasattr(entry, 'findtext'):
+        return entry
+    label = entry.findtext('kana') or u''
+    kanji = [k.text for k in entry.findall('kanji')]
+    if kanji:
+        label += u'【' + u'・'.join(kanji) + u'】'
+    return label
+
+class _NullStage(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+class NullTimer(object):
+    """Does nothing; used when instrumentation is off."""
+
+    _null_stage = _NullStage()
+
+    def stage(self, name, per_entry=True):
+        return self._null_stage
+
+    def add(self, name, seconds, per_entry=True):
+        pass
+
+    def iterate(self, name, iterable):
+        return iterable
+
+    def end_entry(self, entry):
+        pass
+
+    def count(self, name, hits, misses):
+        pass
+
+class _Stage(object):
+    __slots__ = ('timer', 'name', 'per_entry', 'start')
+
+    def __init__(self, timer, name, per_entry):
+        self.timer = timer
+        self.name = name
+        self.per_entry = per_entry
+
+    def __enter__(self):
+        self.start = time.time()
+
+    def __exit__(self, *exc_info):
+        self.timer.add(self.name, time.time() - self.start, self.per_entry)
+
+class StageTimer(object):
+    """Cumulative time per stage, entry latencies and the slowest entries.
+
+    Stage names containing a dot (``transform.gsg``) are breakdowns of
+    the stage before the dot and are not counted twice. An entry's
+    latency is the time spent in the top-level stages since the previous
+    ``end_entry`` call; stages with ``per_entry=False`` (e.g. loading the
+    examples once) are left out of it. ``count`` records the hits and
+    misses of a cache for the report.
+    """
+
+    def __init__(self, slowest=10):
+        super(StageTimer, self).__init__()
+        self.seconds = dict()
+        self.calls = dict()
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.slowest_count = slowest
+        self.slowest = list() # min-heap of (latency, entry number, headword)
+        self.entries = 0
+        self.current = 0.0
+        self.caches = dict()
+        self.start = time.time()
+
+    def stage(self, name, per_entry=True):
+        return _Stage(self, name, per_entry)
+
+    def add(self, name, seconds, per_entry=True):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if per_entry and '.' not in name:
+            self.current += seconds
+
+    def iterate(self, name, iterable):
+        """Iterate over ``iterable``, timing each step as stage ``name``."""
+        it = iter(iterable)
+        while True:
+            start = time.time()
+            try:
+                item = next(it)
+            finally:
+                self.add(name, time.time() - start)
+            yield item
+
+    def end_entry(self, entry):
+        """Finish the current entry. ``entry`` is its output element or a
+        label for it."""
+        latency = self.current
+        self.current = 0.0
+        self.entries += 1
+        self.histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, latency * 1000)] += 1
+        if len(self.slowest) < self.slowest_count:
+            heapq.heappush(self.slowest, (latency, self.entries, entry_headword(entry)))
+        elif self.slowest and latency > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (latency, self.entries, entry_headword(entry)))
+
+    def count(self, name, hits, misses):
+        self.caches[name] = {'hits': hits, 'misses': misses}
+
+    def report(self):
+        stages = dict()
+        for name, seconds in self.seconds.items():
+            stages[name] = {'seconds': seconds, 'calls': self.calls[name]}
+        histogram = list()
+        for le, count in zip(LATENCY_BUCKETS_MS + [None], self.histogram):
+            histogram.append({'le_ms': le, 'count': count})
+        slowest = list()
+        for latency, number, headword in sorted(self.slowest, reverse=True):
+            slowest.append({'headword': headword, 'entry': number, 'seconds': latency})
+        return {'wall_seconds': time.time() - self.start,
+                'entries': self.entries,
+                'stages': stages,
+                'latency_histogram': histogram,
+                'slowest_entries': slowest,
+                'caches': self.caches}
+
+    def write_report(self, path):
+        with open(path, 'wb') as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+
+@contextlib.contextmanager
+def profiled(dump_path):
+    """Run the body under cProfile and dump the stats to ``dump_path``;
+    does nothing when ``dump_path`` is None."""
+    if dump_path is None:
+        yield
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(dump_path)
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+def release(elem):
+    """Free an element of an incremental parse once it has been used.
+
+    ``elem.clear()`` empties the element but leaves it attached to its
+    parent, so the tree still grows by one element per entry. The
+    elements in front of it are removed as well, which keeps the parent
+    at a single child however long the document is.
+    """
+    elem.clear()
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
+def iter_released(events):
+    """Pass on the ``(action, elem)`` pairs of ``iterparse`` or
+    ``read_events``, releasing each element when the next one is asked
+    for. Elements must not be kept beyond that."""
+    for action, elem in events:
+        yield action, elem
+        release(elem)
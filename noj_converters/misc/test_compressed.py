@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+from noj_converters.misc import compressed
+
+DATA = b''.join(b'line %d \xe3\x81\x82\n' % i for i in range(50000))
+
+class TestCompressed(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='noj_test')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name, *parts):
+        """Write ``parts`` as consecutive compressed streams."""
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as out:
+            for part in parts:
+                part_path = path + '.part' + os.path.splitext(name)[1]
+                with compressed.open_output(part_path) as f:
+                    f.write(part)
+                with open(part_path, 'rb') as f:
+                    out.write(f.read())
+        return path
+
+    def compressions(self):
+        names = ['gz', 'bz2']
+        try:
+            compressed._lzma()
+            names.append('xz')
+        except Exception:
+            pass
+        return names
+
+    def test_read(self):
+        for name in self.compressions():
+            path = self.write('data.' + name, DATA)
+            with compressed.open_input(path) as f:
+                chunks = list()
+                while True:
+                    chunk = f.read(1000)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                self.assertEqual(b''.join(chunks), DATA)
+                self.assertEqual(f.tell(), len(DATA))
+
+    def test_concatenated_streams(self):
+        for name in self.compressions():
+            path = self.write('data.' + name, DATA[:100000], DATA[100000:])
+            with compressed.open_input(path) as f:
+                self.assertEqual(f.read(), DATA)
+
+    def test_lines(self):
+        path = self.write('data.gz', DATA)
+        with compressed.open_input(path) as f:
+            self.assertEqual(list(f), DATA.splitlines(True))
+
+    def test_compressed_offset(self):
+        path = self.write('data.gz', DATA)
+        size = os.path.getsize(path)
+        offsets = list()
+        with compressed.open_input(path) as f:
+            while f.read(10000):
+                offsets.append(compressed.compressed_offset(f, f.tell()))
+        self.assertEqual(offsets, sorted(offsets))
+        self.assertEqual(offsets[-1], size)
+
+        # The same, mapped as the chunks are read
+        def chunks(f):
+            while True:
+                chunk = f.read(10000)
+                if not chunk:
+                    return
+                yield chunk, f.tell()
+        with compressed.open_input(path) as f:
+            self.assertEqual([disk_pos for chunk, (pos, disk_pos)
+                              in compressed.with_disk_offsets(f, chunks(f))], offsets)
+
+    def test_seek(self):
+        path = self.write('data.bz2', DATA)
+        with compressed.open_input(path) as f:
+            f.seek(300000)
+            self.assertEqual(f.read(10), DATA[300000:300010])
+            f.seek(5)
+            self.assertEqual(f.read(10), DATA[5:15])
+            self.assertEqual(f.tell(), 15)
+
+    def test_resume_output(self):
+        path = os.path.join(self.tmp_dir, 'data.txt')
+        with compressed.open_output(path) as f:
+            f.write(DATA)
+        with compressed.open_output(path, resume_at=1000) as f:
+            f.write(b'end')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), DATA[:1000] + b'end')
+        self.assertRaises(Exception, compressed.open_output, path + '.gz', 1000)
+
+    def test_plain(self):
+        path = os.path.join(self.tmp_dir, 'data.txt')
+        with compressed.open_output(path) as f:
+            f.write(DATA)
+        with compressed.open_input(path) as f:
+            self.assertEqual(f.read(), DATA)
+            self.assertEqual(compressed.compressed_offset(f, 123), 123)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from lxml import etree
+from noj_converters.misc.entry_tree import Node
+
+class TestEntryTree(unittest.TestCase):
+
+    def assertSameAsLxml(self, node):
+        for pretty_print in (True, False):
+            expected = etree.tostring(node.to_element(), encoding='utf-8',
+                                      pretty_print=pretty_print)
+            if pretty_print:
+                expected = expected[:-1]
+            self.assertEqual(node.to_xml(pretty_print), expected)
+
+    def test_texts(self):
+        root = Node('entry', format='J-E1')
+        for text in (None, u'', u'かな', 'ascii'):
+            node = Node('kana')
+            node.text = text
+            root.append(node)
+        root.append(Node('definition'))
+        self.assertSameAsLxml(root)
+
+    def test_escaping(self):
+        node = Node('usage_example', type=u'a&b<c>"d"\te\nf\rg')
+        node.set('validated', 'false')
+        expression = Node('expression')
+        expression.text = u'a&b<c>"d"\te\nf\rg ]]> \'h\''
+        node.append(expression)
+        self.assertSameAsLxml(node)
+
+    def test_nesting(self):
+        root = Node('entry')
+        group = Node('definition', group='multidefinition')
+        for i in range(3):
+            definition = Node('definition')
+            text = Node('definition_text')
+            text.text = u'定義 {}'.format(i)
+            definition.append(text)
+            if i == 1:
+                sub = Node('definition', group='subsubdefinition')
+                sub.append(Node('usage_example', type='UNKNOWN'))
+                definition.append(sub)
+            group.append(definition)
+        root.append(group)
+        self.assertSameAsLxml(root)
+
+    def test_mixed_content(self):
+        root = Node('entry')
+        mixed = Node('definition')
+        mixed.text = u'text'
+        child = Node('definition')
+        child.append(Node('kana'))
+        mixed.append(child)
+        root.append(mixed)
+        self.assertSameAsLxml(root)
+
+if __name__ == '__main__':
+    unittest.main()
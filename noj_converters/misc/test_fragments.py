@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from noj_converters.misc.fragments import FragmentCache, fragment_stats
+
+class TestFragments(unittest.TestCase):
+
+    def test_fragment_cache(self):
+        cache = FragmentCache('(', ') (', ')', max_size=2)
+        first = cache.join(['uk', 'abbr'])
+        self.assertEqual(first, '(uk) (abbr)')
+        self.assertIs(cache.join(['uk', 'abbr']), first)
+        self.assertEqual(cache.join(['uk']), '(uk)')
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 2, 2))
+        # Full, so the next new fragment starts the cache over
+        self.assertEqual(cache.join(['arch']), '(arch)')
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(fragment_stats([cache, FragmentCache('', '', '')]), (1, 3))
+
+if __name__ == '__main__':
+    unittest.main()
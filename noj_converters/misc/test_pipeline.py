@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from noj_converters.misc.pipeline import Pipeline
+
+class TestPipeline(unittest.TestCase):
+
+    def test_pipeline(self):
+        pipeline = Pipeline(queue_size=2, batch_size=3)
+        written = list()
+        with pipeline.write_behind(written.append, 'write') as writer:
+            for item in pipeline.read_ahead(xrange(100), 'read'):
+                writer.put(item * 2)
+        self.assertEqual(written, range(0, 200, 2))
+        self.assertEqual([(q.name, q.batches) for q in pipeline.queues],
+                         [('write', 34), ('read', 34)])
+        self.assertTrue(all(q.max_depth <= 2 for q in pipeline.queues))
+
+        def failing_read():
+            yield 1
+            raise ValueError('read')
+        with self.assertRaisesRegexp(ValueError, 'read'):
+            list(pipeline.read_ahead(failing_read(), 'read'))
+
+        def failing_write(item):
+            raise ValueError('write')
+        with self.assertRaisesRegexp(ValueError, 'write'):
+            with pipeline.write_behind(failing_write, 'write') as writer:
+                for item in xrange(100):
+                    writer.put(item)
+        # Giving up early stops the reader
+        for item in pipeline.read_ahead(xrange(1000), 'read'):
+            break
+
+if __name__ == '__main__':
+    unittest.main()
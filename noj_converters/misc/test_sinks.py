@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from lxml import etree
+from noj_converters.misc.entry_tree import Node
+from noj_converters.misc import sinks
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+NAMESPACE_PREFIX = '{http://www.naturalorderjapanese.com}'
+NSMAP = {None: 'http://www.naturalorderjapanese.com',
+         'xsi': 'http://www.w3.org/2001/XMLSchema-instance'}
+ROOT_ATTRIB = {'{http://www.w3.org/2001/XMLSchema-instance}schemaLocation': 'x.xsd',
+               'schema_version': '1.0.0a'}
+
+def create_meta():
+    meta = Node('dictionary_meta')
+    for tag, text in (('name', u'大辞林'), ('convert_version', '1.0.0a')):
+        child = Node(tag)
+        child.text = text
+        meta.append(child)
+    return meta
+
+def create_entries():
+    entries = list()
+    for kana, kanji in ((u'あい', [u'愛', u'哀']), (u'ああ', [])):
+        entry = Node('entry', format='J-J1')
+        child = Node('kana')
+        child.text = kana
+        entry.append(child)
+        for k in kanji:
+            child = Node('kanji')
+            child.text = k
+            entry.append(child)
+        definition = Node('definition', group='multidefinition')
+        text = Node('definition_text')
+        text.text = u'「―を注ぐ」 & <more>'
+        definition.append(text)
+        definition.append(Node('usage_example', type='UNKNOWN'))
+        entry.append(definition)
+        entries.append(entry)
+    return entries
+
+# What entry_record should make of the first entry of create_entries
+FIRST_RECORD = [u'entry', {u'format': u'J-J1'}, None,
+                [[u'kana', {}, u'あい', []],
+                 [u'kanji', {}, u'愛', []],
+                 [u'kanji', {}, u'哀', []],
+                 [u'definition', {u'group': u'multidefinition'}, None,
+                  [[u'definition_text', {}, u'「―を注ぐ」 & <more>', []],
+                   [u'usage_example', {u'type': u'UNKNOWN'}, None, []]]]]]
+
+META_RECORD = {u'name': u'大辞林', u'convert_version': u'1.0.0a', u'schema_version': u'1.0.0a'}
+
+class TestSinks(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='noj_test')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, output_format):
+        path = os.path.join(self.tmp_dir, 'dictionary' + sinks.EXTENSIONS[output_format])
+        entries = create_entries()
+        with sinks.open_sink(output_format, path, 'dictionary', ROOT_ATTRIB) as sink:
+            sink.write_meta(create_meta())
+            for entry in entries:
+                sink.write(entry)
+        return path, [sinks.entry_record(entry) for entry in entries]
+
+    def test_xml(self):
+        """XmlSink writes what the converters used to write with lxml."""
+        path = os.path.join(self.tmp_dir, 'dictionary.xml')
+        with sinks.XmlSink(path, NAMESPACE_PREFIX + 'dictionary', ROOT_ATTRIB, NSMAP) as sink:
+            sink.write_meta(create_meta())
+            for entry in create_entries():
+                sink.write(entry)
+        lxml_path = os.path.join(self.tmp_dir, 'lxml.xml')
+        with open(lxml_path, 'wb') as out:
+            with etree.xmlfile(out, encoding='utf-8') as xf:
+                xf.write_declaration()
+                with xf.element(NAMESPACE_PREFIX + 'dictionary', nsmap=NSMAP, attrib=ROOT_ATTRIB):
+                    xf.write("\n")
+                    xf.write(create_meta().to_element(), pretty_print=True)
+                    for entry in create_entries():
+                        xf.write(entry.to_element(), pretty_print=True)
+        with open(lxml_path, 'rb') as f:
+            expected = f.read()
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+
+    def test_compact(self):
+        path = os.path.join(self.tmp_dir, 'compact.xml')
+        entry = Node('entry', format='J-E1')
+        entry.append(Node('kana'))
+        with sinks.XmlSink(path, 'dictionary', pretty_print=False) as sink:
+            sink.write(entry)
+            sink.write(entry)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b"<?xml version='1.0' encoding='utf-8'?>\n<dictionary>\n"
+                                       b'<entry format="J-E1"><kana/></entry>'
+                                       b'<entry format="J-E1"><kana/></entry></dictionary>')
+
+    def test_jsonl(self):
+        path, records = self.write('jsonl')
+        with open(path, 'rb') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 3)
+        # Non-ASCII characters are escaped
+        self.assertTrue(all(ord(c) < 128 for c in b''.join(lines)))
+        self.assertEqual(json.loads(lines[0]), META_RECORD)
+        self.assertEqual([json.loads(line) for line in lines[1:]], records)
+        self.assertEqual(records[0], FIRST_RECORD)
+
+    def test_sqlite(self):
+        path, records = self.write('sqlite')
+        conn = sqlite3.connect(path)
+        self.assertEqual(dict(conn.execute('SELECT name, value FROM meta')), META_RECORD)
+        self.assertEqual([(entry_id, json.loads(entry)) for entry_id, entry in
+                          conn.execute('SELECT id, entry FROM entries ORDER BY id')],
+                         [(1, records[0]), (2, records[1])])
+        self.assertEqual(list(conn.execute('SELECT entry_id, kana FROM kana ORDER BY rowid')),
+                         [(1, u'あい'), (2, u'ああ')])
+        self.assertEqual(list(conn.execute('SELECT entry_id, kanji FROM kanji ORDER BY rowid')),
+                         [(1, u'愛'), (1, u'哀')])
+        self.assertEqual(sorted(conn.execute("SELECT name, tbl_name FROM sqlite_master "
+                                             "WHERE type = 'index' AND sql IS NOT NULL")),
+                         [(u'kana_index', u'kana'), (u'kanji_index', u'kanji')])
+        # Looking an entry up by kanji
+        self.assertEqual(list(conn.execute('SELECT e.id FROM kanji k JOIN entries e '
+                                           'ON e.id = k.entry_id WHERE k.kanji = ?', (u'哀',))),
+                         [(1,)])
+        conn.close()
+
+    @unittest.skipIf(msgpack is None, "needs the msgpack package")
+    def test_msgpack(self):
+        path, records = self.write('msgpack')
+        with open(path, 'rb') as f:
+            unpacker = msgpack.Unpacker(f, raw=False)
+            objects = list(unpacker)
+        self.assertEqual(objects[0], META_RECORD)
+        self.assertEqual(objects[1:], records)
+        self.assertEqual(objects[1], FIRST_RECORD)
+
+    def test_sharded(self):
+        path = os.path.join(self.tmp_dir, 'dictionary.xml')
+        meta = Node('dictionary_meta')
+        entries = list()
+        for kana in (u'あ', u'い', u'う', u'え', u'お'):
+            entry = Node('entry')
+            entry.append(Node('kana'))
+            entry.children[0].text = kana
+            entries.append(entry)
+        for split, counts in ((('entries', 2), [2, 2, 1]), (('kana', 2), None)):
+            with sinks.open_sink('xml', path, 'dictionary', shards=split) as sink:
+                sink.write_meta(meta)
+                for entry in entries:
+                    sink.write(entry)
+            with open(os.path.join(self.tmp_dir, 'dictionary.shards.json'), 'rb') as f:
+                manifest = json.load(f)
+            self.assertEqual(manifest['entries'], 5)
+            kanas = list()
+            for shard in manifest['shards']:
+                root = etree.parse(os.path.join(self.tmp_dir, shard['path'])).getroot()
+                self.assertEqual(root[0].tag, 'dictionary_meta')
+                self.assertEqual(len(root) - 1, shard['entries'])
+                kanas.extend(entry.findtext('kana') for entry in root[1:])
+            if counts is not None:
+                self.assertEqual([shard['entries'] for shard in manifest['shards']], counts)
+                self.assertEqual([(shard['first_entry'], shard['last_entry'])
+                                  for shard in manifest['shards']], [(0, 1), (2, 3), (4, 4)])
+            self.assertEqual(sorted(kanas), sorted(entry.children[0].text for entry in entries))
+
+    def test_sharded_abort(self):
+        path = os.path.join(self.tmp_dir, 'dictionary.xml')
+        manifest_path = os.path.join(self.tmp_dir, 'dictionary.shards.json')
+        entries = list()
+        for kana in (u'あ', u'い', u'う'):
+            entry = Node('entry')
+            entry.append(Node('kana'))
+            entry.children[0].text = kana
+            entries.append(entry)
+        with sinks.open_sink('xml', path, 'dictionary', shards=('entries', 2)) as sink:
+            sink.write_meta(Node('dictionary_meta'))
+        self.assertTrue(os.path.exists(manifest_path))
+        # An interrupted run leaves no manifest, not even the last one
+        with self.assertRaises(KeyboardInterrupt):
+            with sinks.open_sink('xml', path, 'dictionary', shards=('entries', 2)) as sink:
+                sink.write_meta(Node('dictionary_meta'))
+                for entry in entries:
+                    sink.write(entry)
+                raise KeyboardInterrupt()
+        self.assertFalse(os.path.exists(manifest_path))
+        # The full shard was finished before
+        root = etree.parse(os.path.join(self.tmp_dir, 'dictionary.000.xml')).getroot()
+        self.assertEqual(len(root), 3)
+        with open(os.path.join(self.tmp_dir, 'dictionary.001.xml'), 'rb') as f:
+            self.assertFalse(f.read().rstrip().endswith(b'</dictionary>'))
+
+    def test_sqlite_abort(self):
+        path = os.path.join(self.tmp_dir, 'dictionary.sqlite')
+        entries = create_entries()
+        with self.assertRaises(KeyboardInterrupt):
+            with sinks.open_sink('sqlite', path, 'dictionary', ROOT_ATTRIB) as sink:
+                sink.write_meta(create_meta())
+                sink.write(entries[0])
+                sink.tell()
+                sink.write(entries[1])
+                raise KeyboardInterrupt()
+        conn = sqlite3.connect(path)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0], 1)
+        self.assertEqual(conn.execute("SELECT name FROM sqlite_master WHERE name LIKE '%_index'")
+                         .fetchall(), [])
+        conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from noj_converters.misc.sqlite_file import SourceIndex
+
+class LineIndex(SourceIndex):
+    """Numbers the lines of the source; counts its builds."""
+
+    version = '1'
+    builds = 0
+
+    def fill(self, conn):
+        LineIndex.builds += 1
+        conn.execute('CREATE TABLE lines (line TEXT)')
+        with open(self.source_path, 'rb') as f:
+            conn.executemany('INSERT INTO lines VALUES (?)', [(line,) for line in f])
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM lines').fetchone()[0]
+
+class TestSqliteFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp(prefix='noj_test')
+        self.source_path = os.path.join(self.tmp_dir, 'source.txt')
+        self.write('a\nb\n')
+        LineIndex.builds = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, data):
+        with open(self.source_path, 'wb') as f:
+            f.write(data)
+
+    def test_source_index(self):
+        index = LineIndex(self.source_path)
+        self.assertEqual((len(index), LineIndex.builds), (2, 1))
+        self.assertEqual(index.read_meta()['version'], '1')
+        self.assertFalse(os.path.exists(index.path + '.tmp'))
+        index.close()
+        # Still current
+        index = LineIndex(self.source_path)
+        self.assertEqual(LineIndex.builds, 1)
+        index.close()
+        # The source changed, and then the version
+        self.write('a\nb\nc\n')
+        index = LineIndex(self.source_path)
+        self.assertEqual((len(index), LineIndex.builds), (3, 2))
+        index.close()
+        LineIndex.version = '2'
+        try:
+            index = LineIndex(self.source_path)
+            self.assertEqual(LineIndex.builds, 3)
+            index.close()
+        finally:
+            LineIndex.version = '1'
+
+    def test_pickle(self):
+        index = LineIndex(self.source_path, os.path.join(self.tmp_dir, 'index.sqlite'))
+        self.assertEqual(len(index), 2)
+        copy = pickle.loads(pickle.dumps(index))
+        self.assertIsNone(copy._conn)
+        self.assertEqual(len(copy), 2)
+        copy.close()
+        index.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from noj_converters.misc.entry_tree import Node
+from noj_converters.misc.stage_timer import LATENCY_BUCKETS_MS, StageTimer
+
+class TestStageTimer(unittest.TestCase):
+
+    def test_report(self):
+        timer = StageTimer(slowest=3)
+        timer.add('load_examples', 5.0, per_entry=False)
+        # (stage, seconds) pairs of each entry
+        for label, times in ((u'あ', [('parse', 0.0003), ('parse.gsg', 0.0003)]),
+                             (u'い', [('parse', 0.004), ('serialize', 0.002)]),
+                             (u'う', [('parse', 0.0007)]),
+                             (u'え', [('parse', 7.0)]),
+                             (u'お', [('serialize', 0.003)])):
+            for name, seconds in times:
+                timer.add(name, seconds)
+            timer.end_entry(label)
+        report = timer.report()
+
+        self.assertEqual(report['entries'], 5)
+        self.assertEqual(report['stages']['parse']['calls'], 4)
+        self.assertAlmostEqual(report['stages']['parse']['seconds'], 7.005)
+        self.assertEqual(report['stages']['load_examples'],
+                         {'seconds': 5.0, 'calls': 1})
+        # Breakdowns and the examples are not part of the latencies
+        counts = dict((bucket['le_ms'], bucket['count'])
+                      for bucket in report['latency_histogram'])
+        self.assertEqual([bucket['le_ms'] for bucket in report['latency_histogram']],
+                         LATENCY_BUCKETS_MS + [None])
+        self.assertEqual(dict((le, count) for le, count in counts.items() if count),
+                         {0.5: 1, 1: 1, 5: 1, 10: 1, None: 1})
+        self.assertEqual([(slow['headword'], slow['entry'])
+                          for slow in report['slowest_entries']],
+                         [(u'え', 4), (u'い', 2), (u'お', 5)])
+        self.assertAlmostEqual(report['slowest_entries'][1]['seconds'], 0.006)
+
+    def test_headword(self):
+        timer = StageTimer(slowest=1)
+        entry = Node('entry')
+        for tag, text in (('kana', u'あい'), ('kanji', u'愛'), ('kanji', u'哀')):
+            child = Node(tag)
+            child.text = text
+            entry.append(child)
+        timer.add('parse', 0.001)
+        timer.end_entry(entry)
+        self.assertEqual(timer.report()['slowest_entries'][0]['headword'], u'あい【愛・哀】')
+
+if __name__ == '__main__':
+    unittest.main()